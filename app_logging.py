@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Logging setup for Smart Clipboard WhatsApp Sender
+Log records are handed to a background thread through a queue, so writing
+to disk never slows down clipboard monitoring or opening chats
+"""
+
+import atexit
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+logger = logging.getLogger(__name__)
+
+_listener = None
+_queue_handler = None
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as one JSON object per line for log collectors"""
+    
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+def gzip_namer(name):
+    """Name rotated log files with a .gz suffix"""
+    return name + ".gz"
+
+def gzip_rotator(source, dest):
+    """Compress a rotated log file (runs on the background log thread)"""
+    with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+def create_file_handler(log_file, config):
+    """Create a size- or time-rotating file handler from config
+    
+    An invalid log_rotate_when is logged and replaced by size-based rotation
+    rather than stopping the app.
+    """
+    backup_count = config.get("log_backup_count", 5)
+    rotate_when = config.get("log_rotate_when")
+    
+    handler = None
+    if rotate_when:
+        try:
+            # delay: no file is left open if the schedule is invalid
+            handler = logging.handlers.TimedRotatingFileHandler(
+                log_file, when=rotate_when, backupCount=backup_count, encoding='utf-8', delay=True
+            )
+        except ValueError:
+            logger.warning(f"Invalid log_rotate_when {rotate_when!r}, rotating by size instead")
+    if handler is None:
+        handler = logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=config.get("log_max_bytes", 5 * 1024 * 1024),
+            backupCount=backup_count, encoding='utf-8'
+        )
+    
+    if config.get("log_compress", True):
+        handler.namer = gzip_namer
+        handler.rotator = gzip_rotator
+    
+    return handler
+
+def setup_logging(log_file, config, level=logging.INFO):
+    """Route logging through a queue to a background writer thread
+    
+    Only the first call configures logging; later calls (for example from a
+    second app instance in the same process) keep the existing setup.
+    """
+    global _listener, _queue_handler
+    if _listener is not None:
+        return _listener
+    
+    # Records logged while the handlers are built wait in the queue
+    log_queue = queue.Queue(-1)
+    root = logging.getLogger()
+    root.setLevel(level)
+    _queue_handler = logging.handlers.QueueHandler(log_queue)
+    root.addHandler(_queue_handler)
+    
+    if config.get("log_format", "text") == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(LOG_FORMAT)
+    handlers = [create_file_handler(log_file, config), logging.StreamHandler()]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+def stop_logging():
+    """Flush queued records and stop the background writer"""
+    global _listener, _queue_handler
+    if _listener is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+        _queue_handler = None
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Pipeline benchmark for Smart Clipboard WhatsApp Sender
+Times detection, URL generation and one monitor iteration on synthetic
+corpora, reporting ops/sec, latency percentiles and peak memory, and
+compares the results against a stored baseline
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_FILE = os.path.join(PROJECT_DIR, "pipeline_baseline.json")
+sys.path.insert(0, PROJECT_DIR)
+
+from clipboard_watchers import AdaptivePollScheduler, FakeClipboardWatcher
+from main import ClipboardWhatsAppSender
+from phone_detector import PhoneNumberDetector
+
+# Fixed seed so every run measures the same inputs
+SEED = 20240501
+
+ARABIC_MESSAGE = "السلام عليكم ورحمة الله وبركاته، نود التواصل معكم بخصوص طلبكم"
+ARABIC_WORDS = ARABIC_MESSAGE.replace("،", "").split()
+WORDS = ("please call me back about the order tomorrow meeting invoice ref "
+         "address delivery thanks regards team office").split()
+
+# Keeps ops/sec regressions below this fraction from failing (noise)
+DEFAULT_TOLERANCE = 0.30
+
+# Timed rounds per benchmark
+ROUNDS = 5
+
+# Memory growth smaller than this is treated as noise (bytes)
+MEMORY_SLACK = 64 * 1024
+
+def random_number(rng):
+    """A phone number in one of the supported formats"""
+    digits = "".join(rng.choice("0123456789") for _ in range(7))
+    return rng.choice([
+        f"+9715{rng.randint(0, 9)}{digits}",
+        f"+44 20 {digits[:4]} {digits[4:]}0",
+        f"({rng.randint(200, 999)}) {digits[:3]}-{digits[3:]}0",
+        f"{rng.randint(200, 999)}-{digits[:3]}-{digits[3:]}0",
+        f"+1-{rng.randint(200, 999)}-{digits[:3]}-{digits[3:]}0",
+        f"9665{digits}00",
+    ])
+
+def build_corpora(seed=SEED):
+    """Return {name: list of clipboard texts}"""
+    rng = random.Random(seed)
+    
+    def sentence(words, count):
+        return " ".join(rng.choice(words) for _ in range(count))
+    
+    corpora = {
+        "clean": [random_number(rng) for _ in range(1000)],
+        "prose": [f"{sentence(WORDS, 8)} {random_number(rng)} {sentence(WORDS, 6)}"
+                  for _ in range(1000)],
+        "noise": [f"{sentence(WORDS, 12)} ref {rng.randint(100, 99999)}" for _ in range(1000)],
+        "arabic": [f"{sentence(ARABIC_WORDS, 8)} {random_number(rng)} {sentence(ARABIC_WORDS, 4)}"
+                   for _ in range(1000)],
+    }
+    
+    # The same few texts copied over and over
+    corpora["repeat"] = corpora["prose"][:10]
+    
+    # A multi-MB paste: long prose with a number every few hundred characters
+    parts = []
+    size = 0
+    while size < 2 * 1024 * 1024:
+        part = f"{sentence(WORDS, 40)} {random_number(rng)}\n"
+        parts.append(part)
+        size += len(part)
+    corpora["paste_2mb"] = ["".join(parts)]
+    return corpora
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+def run_benchmark(function, inputs, min_time):
+    """Call function on each input in turn for at least min_time seconds
+    
+    Returns ops/sec, per-call latency percentiles and peak traced memory.
+    """
+    perf_counter = time.perf_counter
+    
+    # Warm up (fills caches, compiles templates)
+    for item in inputs[:100]:
+        function(item)
+    
+    # Throughput is the best of several rounds, which filters out moments
+    # when the machine was busy with something else
+    latencies = []
+    best = 0.0
+    for _ in range(ROUNDS):
+        calls = 0
+        started = perf_counter()
+        while perf_counter() - started < min_time / ROUNDS or calls < len(inputs):
+            for item in inputs:
+                begin = perf_counter()
+                function(item)
+                latencies.append(perf_counter() - begin)
+            calls += len(inputs)
+        best = max(best, calls / (perf_counter() - started))
+    
+    # Memory is measured in a separate pass because tracing slows calls down
+    tracemalloc.start()
+    for item in inputs:
+        function(item)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    latencies.sort()
+    return {
+        "ops_per_sec": best,
+        "p50_us": percentile(latencies, 0.50) * 1e6,
+        "p90_us": percentile(latencies, 0.90) * 1e6,
+        "p99_us": percentile(latencies, 0.99) * 1e6,
+        "peak_memory_kb": peak / 1024,
+    }
+
+def create_app():
+    """An app instance that never opens chats or touches the duplicate database"""
+    app = ClipboardWhatsAppSender(headless=True, config_overrides={
+        "persistent_duplicates": False,
+        "avoid_duplicates": False,
+        "numbers_only_mode": False,
+    })
+    app.refresh_settings()
+    app.dispatcher.submit = lambda number, message, detected_at=None: True
+    # Keep per-detection log lines out of the measurements
+    logging.getLogger().setLevel(logging.WARNING)
+    return app
+
+def monitor_iteration(app, watcher):
+    """Return a callable doing one monitor_clipboard iteration for a copied text"""
+    def iteration(text):
+        watcher.copy(text)
+        watcher.wait_for_change(0)
+        app.poll_scheduler.record_activity(app.check_clipboard(watcher.read()))
+    return iteration
+
+def build_benchmarks(app, corpora):
+    """Return [(name, function, inputs)]"""
+    uncached = PhoneNumberDetector(normalizer=app.detector.normalizer, cache_size=0)
+    watcher = FakeClipboardWatcher()
+    app.poll_scheduler = AdaptivePollScheduler()
+    message = app.config.get("default_message", ARABIC_MESSAGE)
+    
+    benchmarks = []
+    for corpus in ("clean", "prose", "noise", "arabic"):
+        inputs = corpora[corpus]
+        benchmarks += [
+            (f"is_valid_phone_number/{corpus}", app.is_valid_phone_number, inputs),
+            (f"is_phone_number_only/{corpus}", uncached.is_phone_number_only, inputs),
+            (f"extract_phone_number/{corpus}", uncached.extract_phone_number, inputs),
+            (f"extract_phone_number_cached/{corpus}", app.extract_phone_number, inputs),
+            (f"monitor_iteration/{corpus}", monitor_iteration(app, watcher), inputs),
+        ]
+    
+    benchmarks += [
+        ("extract_phone_number/repeat", uncached.extract_phone_number, corpora["repeat"]),
+        ("extract_phone_number_cached/repeat", app.extract_phone_number, corpora["repeat"]),
+    ]
+    
+    numbers = [uncached.extract_phone_number(text) for text in corpora["clean"]]
+    benchmarks.append(("generate_whatsapp_url/arabic_message",
+                       lambda number: app.generate_whatsapp_url(number, message), numbers))
+    
+    paste = corpora["paste_2mb"]
+    benchmarks += [
+        ("iter_phone_numbers/paste_2mb", lambda text: sum(1 for _ in uncached.iter_phone_numbers(text)),
+         paste),
+        ("monitor_iteration/paste_2mb", monitor_iteration(app, watcher), paste + ["x"]),
+    ]
+    return benchmarks
+
+def compare_with_baseline(results, baseline, tolerance):
+    """Return a list of regression messages (empty when within budget)
+    
+    A benchmark without a baseline counts as a regression, so it cannot
+    pass unchecked.
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            regressions.append(f"{name}: no baseline; run with --save-baseline to record one")
+            continue
+        expected = baseline[name]
+        floor = expected["ops_per_sec"] * (1 - tolerance)
+        if result["ops_per_sec"] < floor:
+            regressions.append(f"{name}: {result['ops_per_sec']:,.0f} ops/s < {floor:,.0f} "
+                               f"(baseline {expected['ops_per_sec']:,.0f})")
+        limit = expected["peak_memory_kb"] * (1 + tolerance) + MEMORY_SLACK / 1024
+        if result["peak_memory_kb"] > limit:
+            regressions.append(f"{name}: peak memory {result['peak_memory_kb']:,.0f} KB > {limit:,.0f} KB "
+                               f"(baseline {expected['peak_memory_kb']:,.0f} KB)")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the detection-to-open pipeline")
+    parser.add_argument("--min-time", type=float, default=1.0,
+                        help="seconds to run each benchmark (default: 1.0)")
+    parser.add_argument("--filter", default="", help="only run benchmarks whose name contains this text")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed ops/sec drop relative to the baseline (default: 0.30 = 30%%)")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--json", metavar="FILE", help="also write the results to FILE")
+    args = parser.parse_args()
+    
+    print("📊 Smart Clipboard WhatsApp Sender - Pipeline Benchmark")
+    print("=" * 55)
+    
+    app = create_app()
+    benchmarks = [benchmark for benchmark in build_benchmarks(app, build_corpora())
+                  if args.filter in benchmark[0]]
+    
+    print(f"{'benchmark':<42} {'ops/s':>12} {'p50 µs':>9} {'p90 µs':>9} {'p99 µs':>9} {'peak KB':>9}")
+    results = {}
+    for name, function, inputs in benchmarks:
+        result = run_benchmark(function, inputs, args.min_time)
+        results[name] = result
+        print(f"{name:<42} {result['ops_per_sec']:>12,.0f} {result['p50_us']:>9.1f} "
+              f"{result['p90_us']:>9.1f} {result['p99_us']:>9.1f} {result['peak_memory_kb']:>9.0f}")
+    
+    app.config_manager.stop()
+    app.processed_numbers.close()
+    
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    
+    baseline = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE) as f:
+            baseline = json.load(f)
+    
+    if args.save_baseline:
+        baseline.update(results)
+        with open(BASELINE_FILE, 'w') as f:
+            json.dump(baseline, f, indent=2)
+        print(f"\n💾 Baseline saved to {os.path.basename(BASELINE_FILE)}")
+        return 0
+    
+    regressions = compare_with_baseline(results, baseline, args.tolerance)
+    if regressions:
+        print("\n❌ Performance regression:")
+        for message in regressions:
+            print(f"   {message}")
+        return 1
+    
+    print(f"\n✅ All benchmarks within {args.tolerance:.0%} of the baseline")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for Smart Clipboard WhatsApp Sender
+Measures per-module import time, constructor time and time-to-first-poll
+for the source tree or a frozen (PyInstaller) build, and compares the
+results against a stored baseline
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_FILE = os.path.join(PROJECT_DIR, "startup_baseline.json")
+
+# Metrics compared against the baseline
+TRACKED_METRICS = ["import_s", "constructor_s", "gui_s", "first_poll_s", "wall_s"]
+
+# Differences smaller than this are treated as noise (seconds)
+ABSOLUTE_SLACK = 0.02
+
+def measure_imports(module="main"):
+    """Return (total seconds, [(module, cumulative seconds)]) from -X importtime"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_DIR, capture_output=True, text=True
+    )
+    
+    modules = []
+    total = 0.0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, _, rest = line.partition(":")
+        _, cumulative, name = [part.strip() for part in rest.split("|")]
+        seconds = int(cumulative) / 1e6
+        modules.append((name, seconds))
+        if name == module:
+            total = seconds
+    
+    modules.sort(key=lambda item: item[1], reverse=True)
+    return total, modules
+
+def measure_startup(command, headless):
+    """Run the app in startup-report mode once and return its timings"""
+    fd, report_path = tempfile.mkstemp(suffix=".json")
+    os.close(fd)
+    
+    try:
+        args = command + ["--startup-report", report_path]
+        if headless:
+            args.append("--headless")
+        
+        started = time.perf_counter()
+        subprocess.run(args, cwd=PROJECT_DIR, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        wall = time.perf_counter() - started
+        
+        with open(report_path) as f:
+            timings = json.load(f)
+        timings["wall_s"] = wall
+        return timings
+    finally:
+        os.remove(report_path)
+
+def run_benchmark(runs, exe=None, headless=False):
+    """Measure startup runs times and return the median of each metric"""
+    if exe:
+        command = [exe]
+        target = "frozen"
+    else:
+        command = [sys.executable, os.path.join(PROJECT_DIR, "main.py")]
+        target = "source"
+    
+    samples = [measure_startup(command, headless) for _ in range(runs)]
+    
+    results = {"target": target, "headless": headless, "runs": runs}
+    for metric in TRACKED_METRICS:
+        values = [sample[metric] for sample in samples if metric in sample]
+        if values:
+            results[metric] = statistics.median(values)
+    
+    if not exe:
+        import_totals = []
+        for _ in range(runs):
+            total, modules = measure_imports()
+            import_totals.append(total)
+        results["import_s"] = statistics.median(import_totals)
+        results["slowest_imports"] = [
+            [name, seconds] for name, seconds in modules[:10]
+        ]
+    
+    return results
+
+def baseline_key(results):
+    """Baselines are kept separately per build type and mode"""
+    mode = "headless" if results["headless"] else "gui"
+    return f"{results['target']}-{mode}"
+
+def compare_with_baseline(results, baseline, tolerance):
+    """Return a list of regression messages (empty when within budget)"""
+    regressions = []
+    for metric in TRACKED_METRICS:
+        if metric not in results or metric not in baseline:
+            continue
+        limit = baseline[metric] * (1 + tolerance) + ABSOLUTE_SLACK
+        if results[metric] > limit:
+            regressions.append(
+                f"{metric}: {results[metric] * 1000:.1f} ms > "
+                f"{limit * 1000:.1f} ms (baseline {baseline[metric] * 1000:.1f} ms)"
+            )
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure application startup time")
+    parser.add_argument("--runs", type=int, default=5, help="number of runs (median is reported)")
+    parser.add_argument("--exe", help="path to a frozen build, e.g. dist/ClipboardWhatsAppSender.exe")
+    parser.add_argument("--headless", action="store_true", help="measure headless startup (no GUI)")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown relative to the baseline (default: 0.25 = 25%%)")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    args = parser.parse_args()
+    
+    print("⏱️ Smart Clipboard WhatsApp Sender - Startup Benchmark")
+    print("=" * 55)
+    
+    results = run_benchmark(args.runs, args.exe, args.headless)
+    key = baseline_key(results)
+    
+    print(f"📦 Target: {key} ({args.runs} runs, median)")
+    for metric in TRACKED_METRICS:
+        if metric in results:
+            print(f"   {metric:<14} {results[metric] * 1000:8.1f} ms")
+    
+    if results.get("slowest_imports"):
+        print("\n🐢 Slowest imports (cumulative):")
+        for name, seconds in results["slowest_imports"]:
+            print(f"   {name:<30} {seconds * 1000:8.1f} ms")
+    
+    baselines = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE) as f:
+            baselines = json.load(f)
+    
+    if args.save_baseline:
+        baselines[key] = {metric: results[metric] for metric in TRACKED_METRICS if metric in results}
+        with open(BASELINE_FILE, 'w') as f:
+            json.dump(baselines, f, indent=2)
+        print(f"\n💾 Baseline saved for {key}")
+        return 0
+    
+    if key not in baselines:
+        # Nothing to compare against would let a regression pass unnoticed
+        print(f"\n❌ No baseline for {key}; run with --save-baseline to record one")
+        return 1
+    
+    regressions = compare_with_baseline(results, baselines[key], args.tolerance)
+    if regressions:
+        print("\n❌ Startup regression:")
+        for message in regressions:
+            print(f"   {message}")
+        return 1
+    
+    print(f"\n✅ Within {args.tolerance:.0%} of the {key} baseline")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Bulk campaigns for Smart Clipboard WhatsApp Sender
+Reads a CSV/TXT list of numbers as a stream and opens a chat for each new
+number at a steady pace, keeping a checkpoint so a stopped run can resume
+"""
+
+import csv
+import json
+import logging
+import os
+import threading
+import time
+
+from config_manager import write_json_atomic
+from dispatch import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# CSV header names recognised as the number and name columns
+NUMBER_COLUMNS = ("number", "phone", "phone_number", "phone number", "mobile", "whatsapp", "tel")
+NAME_COLUMNS = ("name", "full_name", "full name", "contact", "contact_name")
+
+# Checkpoint is written after every open and at least this often while skipping
+CHECKPOINT_EVERY_ROWS = 1000
+
+def open_contact_list(path):
+    """Open a contact list for streaming (UTF-8, BOM tolerated)"""
+    return open(path, 'r', newline='', encoding='utf-8-sig', errors='replace')
+
+def iter_contacts(path, detector):
+    """Yield (row_index, number, name) for every number in a CSV or TXT file
+    
+    CSV files with a recognised header use the number and name columns;
+    other CSV rows and TXT lines are searched for numbers anywhere. Rows are
+    read one at a time, so memory use does not depend on the file size.
+    """
+    with open_contact_list(path) as f:
+        if not path.lower().endswith(".csv"):
+            for row_index, line in enumerate(f):
+                for number in detector.iter_phone_numbers(line):
+                    yield row_index, number, ""
+            return
+        
+        number_column = name_column = None
+        for row_index, row in enumerate(csv.reader(f)):
+            if row_index == 0:
+                header = [cell.strip().lower() for cell in row]
+                number_column = next((i for i, cell in enumerate(header) if cell in NUMBER_COLUMNS), None)
+                name_column = next((i for i, cell in enumerate(header) if cell in NAME_COLUMNS), None)
+                if number_column is not None:
+                    continue
+            
+            if number_column is None:
+                text = " ".join(row)
+            elif number_column < len(row):
+                text = row[number_column]
+            else:
+                continue
+            name = row[name_column].strip() if name_column is not None and name_column < len(row) else ""
+            
+            for number in detector.iter_phone_numbers(text):
+                yield row_index, number, name
+
+class CampaignRunner:
+    """Opens chats for a contact list at a fixed pace with a resumable checkpoint
+    
+    Duplicates are suppressed with the app's duplicate store, so numbers that
+    were already opened (in this run, an earlier run or from the clipboard
+    within the cooldown) are skipped, and the memory it uses stays bounded.
+    """
+    
+    def __init__(self, app, source, checkpoint_path=None, message=None, rate_per_minute=None):
+        self.app = app
+        self.source = source
+        self.checkpoint_path = checkpoint_path or source + ".checkpoint.json"
+        self.message = message
+        if rate_per_minute is None:
+            rate_per_minute = app.config.get("open_rate_per_minute", 30)
+        # Campaign opens are paced, never dropped
+        self.pacer = TokenBucket(rate=rate_per_minute / 60.0, burst=1, max_wait=float("inf"))
+        
+        # Position is (row, item): the next number to handle is the item-th
+        # number found in that row
+        self.stats = {"row": 0, "item": 0, "opened": 0, "duplicates": 0, "failed": 0}
+        self._stop = threading.Event()
+        self._last_checkpoint_row = 0
+    
+    def stop(self):
+        """Stop after the current number; safe to call from any thread or signal handler"""
+        self._stop.set()
+    
+    def load_checkpoint(self):
+        """Restore progress from the checkpoint file; returns the (row, item) to resume at"""
+        if not os.path.exists(self.checkpoint_path):
+            return 0, 0
+        try:
+            with open(self.checkpoint_path, 'r') as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable checkpoint {self.checkpoint_path}: {e}")
+            return 0, 0
+        
+        if checkpoint.get("source") != os.path.abspath(self.source):
+            raise ValueError(f"Checkpoint {self.checkpoint_path} belongs to {checkpoint.get('source')}")
+        for key in self.stats:
+            self.stats[key] = checkpoint.get(key, 0)
+        self._last_checkpoint_row = self.stats["row"]
+        return self.stats["row"], self.stats["item"]
+    
+    def save_checkpoint(self, finished=False):
+        """Atomically record progress"""
+        checkpoint = dict(self.stats, source=os.path.abspath(self.source), finished=finished,
+                          updated=time.time())
+        write_json_atomic(self.checkpoint_path, checkpoint)
+        self._last_checkpoint_row = self.stats["row"]
+    
+    def is_finished(self):
+        """Check whether the checkpoint records a completed run"""
+        try:
+            with open(self.checkpoint_path, 'r') as f:
+                return bool(json.load(f).get("finished"))
+        except (OSError, ValueError):
+            return False
+    
+    def reset(self):
+        """Discard the checkpoint and start from the first row"""
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+        self.stats = dict.fromkeys(self.stats, 0)
+        self._last_checkpoint_row = 0
+    
+    def _wait_for_turn(self):
+        """Wait until the next open is allowed; returns False if stopped meanwhile"""
+        wait = self.pacer.reserve()
+        if wait:
+            self._stop.wait(wait)
+        return not self._stop.is_set()
+    
+    def _open(self, number, name):
+        """Open one chat and record it"""
+        result = self.app.open_whatsapp(number, self.message, name=name, rate_limited=False)
+        if result:
+            self.app.processed_numbers.add(number)
+            self.stats["opened"] += 1
+        else:
+            self.stats["failed"] += 1
+    
+    def run(self):
+        """Process the list from the checkpoint onwards; returns True when the whole list was handled"""
+        resume_at = self.load_checkpoint()
+        if resume_at != (0, 0):
+            self.app.log_to_gui(f"↩️ Resuming campaign at row {resume_at[0]} "
+                                f"({self.stats['opened']} chats already opened)")
+        
+        row, item = -1, 0
+        try:
+            for row_index, number, name in iter_contacts(self.source, self.app.detector):
+                if row_index == row:
+                    item += 1
+                else:
+                    row, item = row_index, 0
+                if (row, item) < resume_at:
+                    continue
+                if self._stop.is_set():
+                    break
+                
+                duplicate = number in self.app.processed_numbers
+                if duplicate:
+                    self.stats["duplicates"] += 1
+                else:
+                    if not self._wait_for_turn():
+                        break
+                    self._open(number, name)
+                
+                # Everything up to this number is done; record every open,
+                # and long stretches of duplicates now and then
+                self.stats["row"], self.stats["item"] = row, item + 1
+                if not duplicate or row - self._last_checkpoint_row >= CHECKPOINT_EVERY_ROWS:
+                    self.save_checkpoint()
+            else:
+                self.save_checkpoint(finished=True)
+                self.app.log_to_gui(
+                    f"✅ Campaign finished: {self.stats['opened']} opened, "
+                    f"{self.stats['duplicates']} duplicates skipped, {self.stats['failed']} failed"
+                )
+                return True
+        except BaseException:
+            self.save_checkpoint()
+            raise
+        
+        self.save_checkpoint()
+        self.app.log_to_gui(f"⏸️ Campaign stopped at row {self.stats['row']}; run again to resume")
+        return False
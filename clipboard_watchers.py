@@ -0,0 +1,613 @@
+#!/usr/bin/env python3
+"""
+Clipboard watcher backends for Smart Clipboard WhatsApp Sender
+Tells the monitor when the clipboard may have changed and reads its content
+"""
+
+import ctypes
+import ctypes.util
+import hashlib
+import logging
+import os
+import select
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+def clipboard_fingerprint(text):
+    """Cheap length-plus-digest fingerprint used to detect clipboard changes"""
+    digest = hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16)
+    return len(text), digest.digest()
+
+class WatcherUnavailable(RuntimeError):
+    """A watcher can no longer notice clipboard changes (such as a lost X connection)"""
+
+class ClipboardWatcher:
+    """Base class for clipboard watcher backends"""
+    
+    name = "base"
+    # Function (or reader object) that returns the clipboard text
+    paste = None
+    
+    def start(self):
+        """Prepare the backend; called from the monitor thread"""
+    
+    def stop(self):
+        """Wake up a pending wait_for_change; safe to call from any thread"""
+    
+    def close(self):
+        """Release backend resources; called from the monitor thread"""
+        close_reader = getattr(self.paste, "close", None)
+        if close_reader is not None:
+            close_reader()
+    
+    def read(self):
+        """Return the current clipboard text"""
+        raise NotImplementedError
+    
+    def wait_for_change(self, timeout):
+        """Block until the clipboard may have changed or timeout expires
+        
+        Returns True when the clipboard should be read again.
+        """
+        raise NotImplementedError
+
+def pyperclip_paste():
+    """Read the clipboard with pyperclip"""
+    import pyperclip
+    return pyperclip.paste()
+
+class AdaptivePollScheduler:
+    """Polls quickly after clipboard activity and backs off while idle"""
+    
+    def __init__(self, min_interval=0.1, max_interval=2.0, backoff=1.5):
+        if min_interval <= 0 or max_interval < min_interval:
+            raise ValueError("poll intervals must satisfy 0 < min <= max")
+        if backoff < 1.0:
+            raise ValueError("poll backoff must be at least 1.0")
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.interval = min_interval
+    
+    @classmethod
+    def from_config(cls, config):
+        """Build a scheduler from the poll settings in config
+        
+        Invalid settings are logged and replaced by the defaults rather than
+        stopping the monitor.
+        """
+        if not config.get("adaptive_polling", True):
+            # Fixed-interval polling
+            interval = config.get("check_interval", 1.0)
+            try:
+                return cls(interval, interval, 1.0)
+            except (TypeError, ValueError):
+                logger.warning(f"Invalid check_interval {interval!r}, using 1.0")
+                return cls(1.0, 1.0, 1.0)
+        
+        settings = (
+            config.get("poll_min_interval", 0.1),
+            config.get("poll_max_interval", 2.0),
+            config.get("poll_backoff", 1.5),
+        )
+        try:
+            return cls(*settings)
+        except (TypeError, ValueError):
+            logger.warning(f"Invalid poll_min_interval, poll_max_interval or poll_backoff {settings}, "
+                           f"using the defaults")
+            return cls()
+    
+    def record_activity(self, changed):
+        """Reset to the fastest rate after a change, otherwise back off"""
+        if changed:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * self.backoff, self.max_interval)
+    
+    def record_error(self):
+        """Back off after a failed clipboard read"""
+        self.record_activity(False)
+    
+    def next_interval(self):
+        """Seconds to wait before the next poll"""
+        return self.interval
+
+class PollingClipboardWatcher(ClipboardWatcher):
+    """Reads the clipboard every interval seconds, or as a scheduler decides"""
+    
+    name = "polling"
+    
+    def __init__(self, interval=1.0, paste=None, scheduler=None):
+        self.interval = interval
+        self.paste = paste or pyperclip_paste
+        self.scheduler = scheduler
+        self._wake = threading.Event()
+    
+    def start(self):
+        self._wake.clear()
+    
+    def stop(self):
+        self._wake.set()
+    
+    def read(self):
+        return self.paste()
+    
+    def wait_for_change(self, timeout=None):
+        if timeout is None:
+            timeout = self.scheduler.next_interval() if self.scheduler else self.interval
+        # Without notifications any poll may see a change
+        return not self._wake.wait(timeout)
+
+class FakeClipboardWatcher(ClipboardWatcher):
+    """In-memory clipboard for tests and demos"""
+    
+    name = "fake"
+    
+    def __init__(self, text=""):
+        self.text = text
+        self.reads = 0
+        self._changed = threading.Condition()
+        self._pending = False
+        self._stopped = False
+    
+    def copy(self, text):
+        """Simulate the user copying text"""
+        with self._changed:
+            self.text = text
+            self._pending = True
+            self._changed.notify_all()
+    
+    def start(self):
+        with self._changed:
+            self._stopped = False
+    
+    def stop(self):
+        with self._changed:
+            self._stopped = True
+            self._changed.notify_all()
+    
+    def read(self):
+        self.reads += 1
+        return self.text
+    
+    def wait_for_change(self, timeout=None):
+        with self._changed:
+            if not self._pending and not self._stopped:
+                self._changed.wait(timeout)
+            changed = self._pending
+            self._pending = False
+            return changed
+
+class XFixesEvent(ctypes.Structure):
+    """Enough of an XEvent union to read its type (XEvent is 24 longs)"""
+    _fields_ = [("type", ctypes.c_int), ("pad", ctypes.c_long * 24)]
+
+class XSelectionEvent(ctypes.Structure):
+    """XSelectionEvent, sent when a selection has been converted for us"""
+    _fields_ = [
+        ("type", ctypes.c_int),
+        ("serial", ctypes.c_ulong),
+        ("send_event", ctypes.c_int),
+        ("display", ctypes.c_void_p),
+        ("requestor", ctypes.c_ulong),
+        ("selection", ctypes.c_ulong),
+        ("target", ctypes.c_ulong),
+        ("property", ctypes.c_ulong),
+        ("time", ctypes.c_ulong),
+    ]
+
+class XEvent(ctypes.Union):
+    """Full-size XEvent for calls that copy an event out of the queue"""
+    _fields_ = [("type", ctypes.c_int), ("xselection", XSelectionEvent), ("pad", ctypes.c_long * 24)]
+
+class XErrorEvent(ctypes.Structure):
+    """XErrorEvent, passed to the protocol error handler"""
+    _fields_ = [
+        ("type", ctypes.c_int),
+        ("display", ctypes.c_void_p),
+        ("resourceid", ctypes.c_ulong),
+        ("serial", ctypes.c_ulong),
+        ("error_code", ctypes.c_ubyte),
+        ("request_code", ctypes.c_ubyte),
+        ("minor_code", ctypes.c_ubyte),
+    ]
+
+X_ERROR_HANDLER = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p, ctypes.POINTER(XErrorEvent))
+X_IO_ERROR_HANDLER = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p)
+X_IO_ERROR_EXIT_HANDLER = ctypes.CFUNCTYPE(None, ctypes.c_void_p, ctypes.c_void_p)
+
+# XFixes selection event constants
+XFIXES_SELECTION_NOTIFY = 0
+XFIXES_SET_SELECTION_OWNER_NOTIFY_MASK = 1 << 0
+
+# Core X protocol constants
+SELECTION_NOTIFY = 31
+ANY_PROPERTY_TYPE = 0
+CURRENT_TIME = 0
+
+# Seconds to wait for the clipboard owner to hand over its content
+SELECTION_TIMEOUT = 1.0
+
+# Most data read from the selection property at once, in 32-bit units (16 MiB)
+SELECTION_MAX_LONGS = 4 * 1024 * 1024
+
+_x11 = None
+
+# X errors reported for each open display, until check_x11_errors() picks them up
+_x11_failures = {}
+
+def _on_x11_error(display, event):
+    """Record a protocol error (such as BadWindow) instead of exiting"""
+    error = event.contents
+    _x11_failures.setdefault(display, f"X error {error.error_code} in request {error.request_code}")
+    return 0
+
+def _on_x11_io_error(display):
+    """Record a lost X connection"""
+    _x11_failures[display] = "X connection lost"
+    return 0
+
+def _on_x11_io_error_exit(display, user_data):
+    """Return instead of exiting; the display is unusable from now on"""
+
+# Kept referenced for as long as Xlib may call them
+_x11_error_handler = X_ERROR_HANDLER(_on_x11_error)
+_x11_io_error_handler = X_IO_ERROR_HANDLER(_on_x11_io_error)
+_x11_io_error_exit_handler = X_IO_ERROR_EXIT_HANDLER(_on_x11_io_error_exit)
+
+class X11Error(RuntimeError):
+    """An X error was reported for a display"""
+
+def check_x11_errors(display):
+    """Raise X11Error if an X error was reported for display since the last check"""
+    failure = _x11_failures.pop(display, None)
+    if failure is not None:
+        raise X11Error(failure)
+
+def open_x11_display(x11):
+    """Open the default X display; X errors on it are recorded instead of ending the process
+    
+    Xlib's default handlers exit on a protocol error or a lost connection.
+    Surviving a lost connection needs XSetIOErrorExitHandler (libX11 1.7+).
+    """
+    display = x11.XOpenDisplay(None)
+    if not display:
+        raise RuntimeError("Cannot open X display")
+    if hasattr(x11, "XSetIOErrorExitHandler"):
+        x11.XSetIOErrorExitHandler(display, _x11_io_error_exit_handler, None)
+    return display
+
+def close_x11_display(x11, display):
+    """Close display and forget its recorded errors"""
+    x11.XCloseDisplay(display)
+    _x11_failures.pop(display, None)
+
+def load_x11():
+    """Load libX11 with the functions used here, or return None if unavailable"""
+    global _x11
+    if _x11 is not None:
+        return _x11
+    
+    x11_path = ctypes.util.find_library("X11")
+    if not x11_path:
+        return None
+    try:
+        x11 = ctypes.CDLL(x11_path)
+    except OSError:
+        return None
+    
+    x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+    x11.XOpenDisplay.restype = ctypes.c_void_p
+    x11.XCloseDisplay.argtypes = [ctypes.c_void_p]
+    x11.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+    x11.XDefaultRootWindow.restype = ctypes.c_ulong
+    x11.XInternAtom.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_int]
+    x11.XInternAtom.restype = ctypes.c_ulong
+    x11.XConnectionNumber.argtypes = [ctypes.c_void_p]
+    x11.XPending.argtypes = [ctypes.c_void_p]
+    x11.XNextEvent.argtypes = [ctypes.c_void_p, ctypes.POINTER(XFixesEvent)]
+    x11.XFlush.argtypes = [ctypes.c_void_p]
+    x11.XCreateSimpleWindow.argtypes = [
+        ctypes.c_void_p, ctypes.c_ulong, ctypes.c_int, ctypes.c_int, ctypes.c_uint, ctypes.c_uint,
+        ctypes.c_uint, ctypes.c_ulong, ctypes.c_ulong
+    ]
+    x11.XCreateSimpleWindow.restype = ctypes.c_ulong
+    x11.XGetSelectionOwner.argtypes = [ctypes.c_void_p, ctypes.c_ulong]
+    x11.XGetSelectionOwner.restype = ctypes.c_ulong
+    x11.XConvertSelection.argtypes = [
+        ctypes.c_void_p, ctypes.c_ulong, ctypes.c_ulong, ctypes.c_ulong, ctypes.c_ulong, ctypes.c_ulong
+    ]
+    x11.XCheckTypedWindowEvent.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.c_int,
+                                           ctypes.POINTER(XEvent)]
+    x11.XGetWindowProperty.argtypes = [
+        ctypes.c_void_p, ctypes.c_ulong, ctypes.c_ulong, ctypes.c_long, ctypes.c_long, ctypes.c_int,
+        ctypes.c_ulong, ctypes.POINTER(ctypes.c_ulong), ctypes.POINTER(ctypes.c_int),
+        ctypes.POINTER(ctypes.c_ulong), ctypes.POINTER(ctypes.c_ulong), ctypes.POINTER(ctypes.c_void_p)
+    ]
+    x11.XFree.argtypes = [ctypes.c_void_p]
+    
+    x11.XSetErrorHandler.argtypes = [X_ERROR_HANDLER]
+    x11.XSetErrorHandler.restype = ctypes.c_void_p
+    x11.XSetIOErrorHandler.argtypes = [X_IO_ERROR_HANDLER]
+    x11.XSetIOErrorHandler.restype = ctypes.c_void_p
+    if hasattr(x11, "XSetIOErrorExitHandler"):
+        x11.XSetIOErrorExitHandler.argtypes = [ctypes.c_void_p, X_IO_ERROR_EXIT_HANDLER, ctypes.c_void_p]
+        x11.XSetIOErrorExitHandler.restype = None
+    x11.XSetErrorHandler(_x11_error_handler)
+    x11.XSetIOErrorHandler(_x11_io_error_handler)
+    _x11 = x11
+    return x11
+
+def load_x11_libraries():
+    """Load libX11 and libXfixes, or return None if unavailable"""
+    x11 = load_x11()
+    xfixes_path = ctypes.util.find_library("Xfixes")
+    if x11 is None or not xfixes_path:
+        return None
+    
+    try:
+        xfixes = ctypes.CDLL(xfixes_path)
+    except OSError:
+        return None
+    
+    xfixes.XFixesQueryExtension.argtypes = [
+        ctypes.c_void_p, ctypes.POINTER(ctypes.c_int), ctypes.POINTER(ctypes.c_int)
+    ]
+    xfixes.XFixesSelectSelectionInput.argtypes = [
+        ctypes.c_void_p, ctypes.c_ulong, ctypes.c_ulong, ctypes.c_ulong
+    ]
+    return x11, xfixes
+
+class X11ClipboardWatcher(ClipboardWatcher):
+    """Event-driven watcher using X11 selection owner change notifications"""
+    
+    name = "x11"
+    
+    def __init__(self, paste=None, selection=b"CLIPBOARD"):
+        self.paste = paste or pyperclip_paste
+        self.selection = selection
+        self.display = None
+        self.libraries = None
+        self.event_type = None
+        self._wake_read, self._wake_write = None, None
+    
+    @staticmethod
+    def is_available():
+        """Check whether an X display and the XFixes library are present"""
+        return (sys.platform.startswith("linux")
+                and bool(os.environ.get("DISPLAY"))
+                and load_x11_libraries() is not None)
+    
+    def start(self):
+        self.libraries = load_x11_libraries()
+        if self.libraries is None:
+            raise RuntimeError("libX11/libXfixes not found")
+        x11, xfixes = self.libraries
+        
+        self.display = open_x11_display(x11)
+        
+        event_base = ctypes.c_int()
+        error_base = ctypes.c_int()
+        if not xfixes.XFixesQueryExtension(self.display, ctypes.byref(event_base),
+                                           ctypes.byref(error_base)):
+            self.close()
+            raise RuntimeError("XFixes extension not available")
+        self.event_type = event_base.value + XFIXES_SELECTION_NOTIFY
+        
+        root = x11.XDefaultRootWindow(self.display)
+        atom = x11.XInternAtom(self.display, self.selection, 0)
+        xfixes.XFixesSelectSelectionInput(self.display, root, atom,
+                                          XFIXES_SET_SELECTION_OWNER_NOTIFY_MASK)
+        x11.XFlush(self.display)
+        try:
+            check_x11_errors(self.display)
+        except X11Error:
+            self.close()
+            raise
+        
+        # Self-pipe so stop() can interrupt select() from another thread
+        self._wake_read, self._wake_write = os.pipe()
+    
+    def stop(self):
+        if self._wake_write is not None:
+            try:
+                os.write(self._wake_write, b"x")
+            except OSError:
+                pass
+    
+    def close(self):
+        if self.display:
+            close_x11_display(self.libraries[0], self.display)
+            self.display = None
+        super().close()
+        for fd in (self._wake_read, self._wake_write):
+            if fd is not None:
+                os.close(fd)
+        self._wake_read, self._wake_write = None, None
+    
+    def read(self):
+        return self.paste()
+    
+    def _drain_events(self):
+        """Consume queued X events; return True if the selection owner changed"""
+        x11 = self.libraries[0]
+        changed = False
+        event = XFixesEvent()
+        while x11.XPending(self.display):
+            x11.XNextEvent(self.display, ctypes.byref(event))
+            if event.type == self.event_type:
+                changed = True
+        try:
+            check_x11_errors(self.display)
+        except X11Error as e:
+            raise WatcherUnavailable(str(e)) from e
+        return changed
+    
+    def wait_for_change(self, timeout=None):
+        if self._drain_events():
+            return True
+        
+        fd = self.libraries[0].XConnectionNumber(self.display)
+        readable, _, _ = select.select([fd, self._wake_read], [], [], timeout)
+        if self._wake_read in readable:
+            os.read(self._wake_read, 64)
+            return False
+        return self._drain_events()
+
+class X11ClipboardReader:
+    """Reads the clipboard over a persistent X connection instead of running xclip/xsel
+    
+    Each read asks the clipboard owner for UTF-8 text and waits for it on the
+    connection, a couple of round trips rather than a process per poll. Content
+    the owner cannot send that way (no UTF-8 target, or very large clipboards
+    sent in INCR chunks) and any failure are read with the fallback instead.
+    Used from one thread only (the monitor thread).
+    """
+    
+    name = "x11"
+    
+    def __init__(self, fallback=None, selection=b"CLIPBOARD", timeout=SELECTION_TIMEOUT):
+        self.fallback = fallback or pyperclip_paste
+        self.selection = selection
+        self.timeout = timeout
+        self.x11 = None
+        self.display = None
+        self.unavailable = False
+        self.reads = 0
+        self.fallbacks = 0
+    
+    @staticmethod
+    def is_available():
+        """Check whether an X display and libX11 are present"""
+        return (sys.platform.startswith("linux")
+                and bool(os.environ.get("DISPLAY"))
+                and load_x11() is not None)
+    
+    def _connect(self):
+        x11 = load_x11()
+        if x11 is None:
+            raise RuntimeError("libX11 not found")
+        display = open_x11_display(x11)
+        
+        self.x11 = x11
+        self.display = display
+        # Unmapped window that receives the converted selection
+        self.window = x11.XCreateSimpleWindow(display, x11.XDefaultRootWindow(display),
+                                              0, 0, 1, 1, 0, 0, 0)
+        self.selection_atom = x11.XInternAtom(display, self.selection, 0)
+        self.utf8_atom = x11.XInternAtom(display, b"UTF8_STRING", 0)
+        self.incr_atom = x11.XInternAtom(display, b"INCR", 0)
+        self.property_atom = x11.XInternAtom(display, b"CLIPBOARD_WHATSAPP_SELECTION", 0)
+        self.fd = x11.XConnectionNumber(display)
+        check_x11_errors(display)
+    
+    def _wait_for_selection(self):
+        """Wait for the owner's SelectionNotify; returns the event or None on timeout"""
+        x11 = self.x11
+        event = XEvent()
+        deadline = time.monotonic() + self.timeout
+        while not x11.XCheckTypedWindowEvent(self.display, self.window, SELECTION_NOTIFY,
+                                             ctypes.byref(event)):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            select.select([self.fd], [], [], remaining)
+        return event
+    
+    def _read_selection(self):
+        """Return the clipboard text, or None if it has to be read another way"""
+        x11 = self.x11
+        display = self.display
+        owner = x11.XGetSelectionOwner(display, self.selection_atom)
+        check_x11_errors(display)
+        if not owner:
+            # Nothing has been copied
+            return ""
+        
+        x11.XConvertSelection(display, self.selection_atom, self.utf8_atom, self.property_atom,
+                              self.window, CURRENT_TIME)
+        x11.XFlush(display)
+        event = self._wait_for_selection()
+        check_x11_errors(display)
+        if event is None:
+            # A late reply would be taken for the next read's, so start over
+            self.close()
+            return None
+        if not event.xselection.property:
+            # The owner cannot provide UTF-8 text
+            return None
+        
+        actual_type = ctypes.c_ulong()
+        actual_format = ctypes.c_int()
+        item_count = ctypes.c_ulong()
+        bytes_after = ctypes.c_ulong()
+        data = ctypes.c_void_p()
+        x11.XGetWindowProperty(display, self.window, self.property_atom, 0, SELECTION_MAX_LONGS, 1,
+                               ANY_PROPERTY_TYPE, ctypes.byref(actual_type), ctypes.byref(actual_format),
+                               ctypes.byref(item_count), ctypes.byref(bytes_after), ctypes.byref(data))
+        try:
+            if actual_type.value == self.incr_atom or actual_format.value != 8 or bytes_after.value:
+                return None
+            if not data.value:
+                return ""
+            return ctypes.string_at(data.value, item_count.value).decode("utf-8", "replace")
+        finally:
+            if data.value:
+                x11.XFree(data)
+            check_x11_errors(display)
+    
+    def read(self):
+        """Return the current clipboard text"""
+        self.reads += 1
+        text = None
+        if not self.unavailable:
+            try:
+                if self.display is None:
+                    self._connect()
+                text = self._read_selection()
+            except X11Error as e:
+                # Start over with a new connection on the next read
+                logger.warning(f"X error while reading the clipboard ({e}), using pyperclip for this read")
+                self.close()
+            except RuntimeError as e:
+                logger.warning(f"In-process clipboard reader unavailable ({e}), using pyperclip")
+                self.unavailable = True
+        
+        if text is None:
+            self.fallbacks += 1
+            return self.fallback()
+        return text
+    
+    # Usable wherever a paste function is expected
+    __call__ = read
+    
+    def close(self):
+        if self.display:
+            close_x11_display(self.x11, self.display)
+            self.display = None
+
+def create_clipboard_reader(backend="auto"):
+    """Return the function used to read the clipboard for the requested reader backend"""
+    if backend in ("auto", "x11") and X11ClipboardReader.is_available():
+        return X11ClipboardReader()
+    
+    if backend == "x11":
+        logger.warning("In-process X11 clipboard reader unavailable, using pyperclip")
+    
+    return pyperclip_paste
+
+def create_clipboard_watcher(backend="auto", interval=1.0, scheduler=None, paste=None):
+    """Create the best available clipboard watcher for the requested backend"""
+    if backend == "fake":
+        return FakeClipboardWatcher()
+    
+    if backend in ("auto", "x11") and X11ClipboardWatcher.is_available():
+        return X11ClipboardWatcher(paste)
+    
+    if backend == "x11":
+        logger.warning("X11 clipboard notifications unavailable, falling back to polling")
+    
+    return PollingClipboardWatcher(interval, paste=paste, scheduler=scheduler)
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Configuration file handling for Smart Clipboard WhatsApp Sender
+Saves are coalesced and written atomically, and edits made to the file while
+the app is running are picked up without a restart
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+def file_mode_for(path):
+    """Permission bits for writing path: the existing file's, or the umask default"""
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except OSError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+def write_json_atomic(path, data):
+    """Write data as JSON to a temp file next to path, then rename it into place
+    
+    Readers (including other desks syncing the file) see either the old or
+    the new file, never a partially written one. The file keeps its
+    permissions (mkstemp would otherwise leave it readable by the owner only).
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=".config-", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(temp_path, file_mode_for(path))
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+class ConfigManager:
+    """Owns the config dict: loading, debounced atomic saves and hot reload
+    
+    The dict returned by load() is updated in place on reload, so code that
+    holds a reference to it always sees the current settings. Overrides (such
+    as command line options) sit on top of the file: they are never saved and
+    stay in effect when the file is reloaded.
+    """
+    
+    def __init__(self, path, defaults=None, save_delay=0.5, reload_interval=2.0, overrides=None):
+        self.path = path
+        self.defaults = dict(defaults or {})
+        self.overrides = dict(overrides or {})
+        self._overridden = {}  # File or default values hidden by the overrides
+        self.save_delay = save_delay
+        self.reload_interval = reload_interval
+        self.config = dict(self.defaults)
+        
+        self._listeners = []
+        self._lock = threading.RLock()
+        self._save_timer = None
+        self._file_state = None  # (mtime, size) of the file as we last saw it
+        self._stop_watching = threading.Event()
+        self._watcher = None
+    
+    def _stat(self):
+        """Return (mtime, size) of the config file, or None if it is missing"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+    
+    def _read_file(self):
+        """Read the file merged with defaults; raises on missing or invalid JSON"""
+        with open(self.path, 'r') as f:
+            config = json.load(f)
+        if not isinstance(config, dict):
+            raise ValueError("config file must contain a JSON object")
+        # Merge with defaults to ensure all keys exist
+        for key, value in self.defaults.items():
+            if key not in config:
+                config[key] = value
+        return config
+    
+    def _apply_overrides(self, config):
+        """Put the overrides on top of config, remembering the values they hide"""
+        for key, value in self.overrides.items():
+            if key in config:
+                self._overridden[key] = config[key]
+            else:
+                self._overridden.pop(key, None)
+            config[key] = value
+        return config
+    
+    def load(self):
+        """Load configuration from file, falling back to the defaults"""
+        with self._lock:
+            self._file_state = self._stat()
+            if self._file_state is not None:
+                try:
+                    self.config.update(self._read_file())
+                except Exception as e:
+                    logger.error(f"Error loading config: {e}")
+            return self._apply_overrides(self.config)
+    
+    def save(self):
+        """Write the config now, replacing any pending debounced save"""
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            data = dict(self.config)
+            for key in self.overrides:
+                if key in self._overridden:
+                    data[key] = self._overridden[key]
+                else:
+                    data.pop(key, None)
+            try:
+                write_json_atomic(self.path, data)
+                # Our own write must not look like an external edit
+                self._file_state = self._stat()
+                return True
+            except Exception as e:
+                logger.error(f"Error saving config: {e}")
+                return False
+    
+    def schedule_save(self):
+        """Save after save_delay seconds; further calls in that window are merged"""
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+            if self.save_delay <= 0:
+                self._save_timer = None
+                self.save()
+                return
+            self._save_timer = threading.Timer(self.save_delay, self._save_pending)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+    
+    def _save_pending(self):
+        """Timer callback for schedule_save"""
+        with self._lock:
+            if self._save_timer is threading.current_thread():
+                self._save_timer = None
+                self.save()
+    
+    def flush(self):
+        """Write a pending debounced save immediately"""
+        with self._lock:
+            if self._save_timer is not None:
+                self.save()
+    
+    def add_listener(self, callback):
+        """Call callback(changed_keys) after the file was reloaded"""
+        self._listeners.append(callback)
+    
+    def check_for_changes(self):
+        """Reload the file if it changed on disk; returns the set of changed keys"""
+        with self._lock:
+            state = self._stat()
+            if state is None or state == self._file_state:
+                return set()
+            self._file_state = state
+            
+            try:
+                new_config = self._apply_overrides(self._read_file())
+            except Exception as e:
+                # Probably caught mid-edit; the next write changes the mtime again
+                logger.warning(f"Ignoring invalid config file: {e}")
+                return set()
+            
+            changed = {key for key, value in new_config.items()
+                       if self.config.get(key, object()) != value}
+            self.config.update(new_config)
+        
+        if changed:
+            logger.info(f"Reloaded config, changed: {', '.join(sorted(changed))}")
+            for callback in self._listeners:
+                try:
+                    callback(changed)
+                except Exception as e:
+                    logger.error(f"Error applying config changes: {e}")
+        return changed
+    
+    def start_watching(self):
+        """Start checking the file for external edits every reload_interval seconds"""
+        if self.reload_interval <= 0 or self._watcher is not None:
+            return
+        self._stop_watching.clear()
+        self._watcher = threading.Thread(target=self._watch, name="config-watcher",
+                                         daemon=True)
+        self._watcher.start()
+    
+    def _watch(self):
+        """Watcher loop"""
+        while not self._stop_watching.wait(self.reload_interval):
+            self.check_for_changes()
+    
+    def stop(self):
+        """Stop watching and write any pending save"""
+        self._stop_watching.set()
+        if self._watcher is not None and self._watcher is not threading.current_thread():
+            self._watcher.join(timeout=1.0)
+        self._watcher = None
+        self.flush()
+
+class MonitorSettings:
+    """Read-only snapshot of the settings used while monitoring
+    
+    The monitor and opener threads read attributes of one snapshot instead
+    of looking up config keys or Tk variables. Changes build a new snapshot
+    which replaces the old one in a single assignment, so a thread never
+    sees a mix of old and new settings.
+    """
+    
+    __slots__ = ("numbers_only_mode", "avoid_duplicates", "max_scan_chars", "message",
+                 "use_whatsapp_app", "auto_open_browser", "check_interval",
+                 "multi_number_mode", "multi_number_max")
+    
+    def __init__(self, **values):
+        for name in self.__slots__:
+            object.__setattr__(self, name, values[name])
+    
+    @classmethod
+    def from_config(cls, config, message=None):
+        """Build a snapshot from config; a non-blank message overrides the default"""
+        if message is None or not message.strip():
+            message = config.get("default_message", "Hello!")
+        else:
+            message = message.strip()
+        return cls(
+            numbers_only_mode=config.get("numbers_only_mode", False),
+            avoid_duplicates=config.get("avoid_duplicates", True),
+            max_scan_chars=config.get("max_scan_chars", 65536),
+            message=message,
+            use_whatsapp_app=config.get("use_whatsapp_app", False),
+            auto_open_browser=config.get("auto_open_browser", True),
+            check_interval=config.get("check_interval", 1.0),
+            multi_number_mode=config.get("multi_number_mode", False),
+            multi_number_max=config.get("multi_number_max", 500),
+        )
+    
+    def __setattr__(self, name, value):
+        raise AttributeError("MonitorSettings is read-only")
+    
+    def __delattr__(self, name):
+        raise AttributeError("MonitorSettings is read-only")
+    
+    def __repr__(self):
+        values = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"MonitorSettings({values})"
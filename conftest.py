@@ -0,0 +1,12 @@
+#!/usr/bin/env python3
+"""
+Pytest setup for Smart Clipboard WhatsApp Sender tests
+"""
+
+import pytest
+
+@pytest.fixture(autouse=True)
+def temp_workdir(tmp_path, monkeypatch):
+    """Run each test in its own directory, so the config.json, log file and
+    duplicate DB of the apps it builds stay out of the repo"""
+    monkeypatch.chdir(tmp_path)
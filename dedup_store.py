@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Duplicate suppression for Smart Clipboard WhatsApp Sender
+Remembers recently opened numbers with a size limit and a cooldown period
+"""
+
+import logging
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+class DuplicateStore:
+    """Bounded set of recently processed numbers with a per-entry cooldown
+    
+    Entries are kept in insertion order, which is also expiry order because
+    every entry gets the same TTL, so eviction only ever looks at the oldest.
+    """
+    
+    def __init__(self, max_entries=10000, ttl_seconds=None, clock=time.monotonic, backing=None):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        # Optional persistent index consulted when a number is not in memory
+        self.backing = backing
+        self._entries = OrderedDict()  # number -> expiry time (or None)
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def from_config(cls, config):
+        """Build a store from the duplicate settings in config"""
+        ttl_hours = config.get("duplicate_ttl_hours", 24)
+        ttl_seconds = ttl_hours * 3600 if ttl_hours else None
+        
+        backing = None
+        if config.get("persistent_duplicates", True):
+            backing = PersistentDuplicateIndex(
+                config.get("duplicates_db", "processed_numbers.db"),
+                ttl_seconds=ttl_seconds,
+                bloom_capacity=config.get("duplicate_bloom_capacity", 2000000),
+            )
+        
+        return cls(
+            max_entries=config.get("duplicate_max_entries", 10000),
+            ttl_seconds=ttl_seconds,
+            backing=backing,
+        )
+    
+    def _evict(self, now):
+        """Drop expired entries and enforce the size limit"""
+        entries = self._entries
+        while entries:
+            number, expires = next(iter(entries.items()))
+            if len(entries) > self.max_entries or (expires is not None and expires <= now):
+                entries.popitem(last=False)
+            else:
+                break
+    
+    def _contains_in_memory(self, number, now):
+        """Check the in-memory entries; caller holds the lock"""
+        expires = self._entries.get(number, _MISSING)
+        if expires is _MISSING:
+            return False
+        if expires is not None and expires <= now:
+            del self._entries[number]
+            return False
+        return True
+    
+    def __contains__(self, number):
+        with self._lock:
+            if self._contains_in_memory(number, self.clock()):
+                return True
+        return self.backing is not None and number in self.backing
+    
+    def add(self, number):
+        """Remember number, restarting its cooldown"""
+        with self._lock:
+            now = self.clock()
+            expires = now + self.ttl_seconds if self.ttl_seconds else None
+            self._entries.pop(number, None)
+            self._entries[number] = expires
+            self._evict(now)
+        if self.backing is not None:
+            self.backing.add(number)
+    
+    def check_and_add(self, number):
+        """Return True if number is a duplicate, otherwise remember it"""
+        with self._lock:
+            if self._contains_in_memory(number, self.clock()):
+                return True
+        if self.backing is not None and number in self.backing:
+            return True
+        self.add(number)
+        return False
+    
+    def discard(self, number):
+        """Forget a single number"""
+        with self._lock:
+            self._entries.pop(number, None)
+        if self.backing is not None:
+            self.backing.discard(number)
+    
+    def clear(self):
+        """Forget all numbers"""
+        with self._lock:
+            self._entries.clear()
+        if self.backing is not None:
+            self.backing.clear()
+    
+    def close(self):
+        """Release the persistent index, if any"""
+        if self.backing is not None:
+            self.backing.close()
+    
+    def __len__(self):
+        with self._lock:
+            self._evict(self.clock())
+            return len(self._entries)
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings"""
+    
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(capacity, 1)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+    
+    def _positions(self, key):
+        """Bit positions for key using double hashing
+        
+        The filter is rebuilt in every process, so Python's own (per-process
+        salted) string hash is good enough and much cheaper than a digest.
+        """
+        h1 = hash(key)
+        h2 = hash((key, self.size)) | 1
+        size = self.size
+        return [(h1 + i * h2) % size for i in range(self.hash_count)]
+    
+    def add(self, key):
+        bits = self.bits
+        for position in self._positions(key):
+            bits[position >> 3] |= 1 << (position & 7)
+    
+    def __contains__(self, key):
+        bits = self.bits
+        for position in self._positions(key):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+class PersistentDuplicateIndex:
+    """SQLite-backed record of opened numbers that survives restarts
+    
+    The database is opened on first use. A Bloom filter of the stored numbers
+    is then built in a background thread; once it is ready, numbers that were
+    never opened are rejected without touching the disk.
+    """
+    
+    def __init__(self, path, ttl_seconds=None, bloom_capacity=2000000, clock=time.time):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.bloom_capacity = bloom_capacity
+        self.clock = clock
+        self._connection = None
+        self._bloom = None          # Ready filter, used for negative lookups
+        self._loading_bloom = None  # Filter being built in the background
+        self._lock = threading.RLock()
+    
+    def _cutoff(self):
+        """Timestamp before which entries have expired"""
+        if not self.ttl_seconds:
+            return float("-inf")
+        return self.clock() - self.ttl_seconds
+    
+    def _connect(self):
+        """Open the database and start loading the Bloom filter; caller holds the lock"""
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS processed_numbers "
+                "(number TEXT PRIMARY KEY, last_seen REAL NOT NULL) WITHOUT ROWID"
+            )
+            connection.commit()
+            self._connection = connection
+            
+            self._loading_bloom = BloomFilter(self.bloom_capacity)
+            threading.Thread(target=self._load_bloom, args=(self._loading_bloom,),
+                             daemon=True).start()
+        return self._connection
+    
+    def _load_bloom(self, bloom):
+        """Fill bloom from the database, then make it the active filter"""
+        try:
+            connection = sqlite3.connect(self.path)
+            try:
+                cutoff = self._cutoff()
+                connection.execute("DELETE FROM processed_numbers WHERE last_seen <= ?", (cutoff,))
+                connection.commit()
+                cursor = connection.execute("SELECT number FROM processed_numbers")
+                while True:
+                    rows = cursor.fetchmany(10000)
+                    if not rows:
+                        break
+                    for (number,) in rows:
+                        bloom.add(number)
+            finally:
+                connection.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Could not load duplicate index filter: {e}")
+            return
+        
+        with self._lock:
+            # Ignore the result if the index was cleared while loading
+            if self._loading_bloom is bloom:
+                self._bloom = bloom
+                self._loading_bloom = None
+    
+    def __contains__(self, number):
+        with self._lock:
+            connection = self._connect()
+            if self._bloom is not None and number not in self._bloom:
+                return False
+            row = connection.execute(
+                "SELECT last_seen FROM processed_numbers WHERE number = ?", (number,)
+            ).fetchone()
+        return row is not None and row[0] > self._cutoff()
+    
+    def add(self, number):
+        """Record that number was opened now"""
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                "INSERT OR REPLACE INTO processed_numbers (number, last_seen) VALUES (?, ?)",
+                (number, self.clock()),
+            )
+            connection.commit()
+            for bloom in (self._bloom, self._loading_bloom):
+                if bloom is not None:
+                    bloom.add(number)
+    
+    def discard(self, number):
+        """Forget a single number"""
+        with self._lock:
+            connection = self._connect()
+            connection.execute("DELETE FROM processed_numbers WHERE number = ?", (number,))
+            connection.commit()
+    
+    def clear(self):
+        """Forget all numbers"""
+        with self._lock:
+            connection = self._connect()
+            connection.execute("DELETE FROM processed_numbers")
+            connection.commit()
+            self._bloom = BloomFilter(self.bloom_capacity)
+            self._loading_bloom = None
+    
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+            self._bloom = None
+            self._loading_bloom = None
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Dispatch queue for Smart Clipboard WhatsApp Sender
+Separates detecting numbers from opening chats so slow browser or app
+launches never stall clipboard monitoring
+"""
+
+import logging
+import threading
+import time
+from collections import deque, namedtuple
+
+logger = logging.getLogger(__name__)
+
+# batch: part of a list of numbers, opened at the sustained rate and never dropped
+DispatchRequest = namedtuple("DispatchRequest", "number message detected_at batch", defaults=(False,))
+
+class DispatchQueue:
+    """Bounded queue of chats to open, consumed by a dedicated worker thread
+    
+    Overflow policies:
+      block        wait up to block_timeout for space, then drop (backpressure)
+      drop_newest  reject the new request when the queue is full
+      drop_oldest  discard the oldest pending request to make room (it is
+                   passed to on_evict, if set)
+      coalesce     merge with a pending request for the same number,
+                   otherwise behave like drop_newest
+    """
+    
+    POLICIES = ("block", "drop_newest", "drop_oldest", "coalesce")
+    
+    def __init__(self, handler, maxsize=64, policy="coalesce", block_timeout=1.0, batch_size=500,
+                 on_evict=None):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown dispatch policy: {policy}")
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.handler = handler
+        self.maxsize = maxsize
+        self.policy = policy
+        self.block_timeout = block_timeout
+        # Extra room for lists: they may fill the queue up to maxsize + batch_size
+        self.batch_size = batch_size
+        # Called with each request discarded by drop_oldest, outside the lock
+        self.on_evict = on_evict
+        
+        self.submitted = 0
+        self.dispatched = 0
+        self.dropped = 0
+        self.coalesced = 0
+        
+        self._pending = deque()
+        self._pending_numbers = {}  # number -> count of pending requests
+        self._condition = threading.Condition()
+        self._running = False
+        self._busy = False
+        self._worker = None
+    
+    @classmethod
+    def settings_from_config(cls, config):
+        """Queue settings from config as keyword arguments
+        
+        An unknown policy or a queue size below 1 is logged and replaced by
+        the default rather than stopping the app.
+        """
+        policy = config.get("dispatch_policy", "coalesce")
+        if policy not in cls.POLICIES:
+            logger.warning(f"Unknown dispatch_policy {policy!r}, using coalesce")
+            policy = "coalesce"
+        maxsize = config.get("dispatch_queue_size", 64)
+        if not isinstance(maxsize, int) or maxsize < 1:
+            logger.warning(f"Invalid dispatch_queue_size {maxsize!r}, using 64")
+            maxsize = 64
+        return {"maxsize": maxsize, "policy": policy, "batch_size": config.get("multi_number_max", 500)}
+    
+    @classmethod
+    def from_config(cls, handler, config, on_evict=None):
+        """Build a queue from the dispatch settings in config"""
+        return cls(handler, on_evict=on_evict, **cls.settings_from_config(config))
+    
+    def apply_config(self, config):
+        """Switch to the dispatch settings in config; pending requests are kept"""
+        settings = self.settings_from_config(config)
+        with self._condition:
+            self.maxsize = settings["maxsize"]
+            self.policy = settings["policy"]
+            self.batch_size = settings["batch_size"]
+            # A larger queue has room for submitters waiting under block
+            self._condition.notify_all()
+    
+    def start(self):
+        """Start the worker thread if it is not already running"""
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+            self._worker = threading.Thread(target=self._run, name="whatsapp-opener",
+                                            daemon=True)
+            self._worker.start()
+    
+    def stop(self, timeout=None):
+        """Stop the worker after the request it is handling; pending requests are kept"""
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._worker is not None and self._worker is not threading.current_thread():
+            self._worker.join(timeout)
+        self._worker = None
+    
+    def _append(self, request):
+        """Queue request; caller holds the condition"""
+        self._pending.append(request)
+        self._pending_numbers[request.number] = self._pending_numbers.get(request.number, 0) + 1
+        self._condition.notify_all()
+    
+    def _popleft(self):
+        """Take the oldest request; caller holds the condition"""
+        request = self._pending.popleft()
+        count = self._pending_numbers[request.number] - 1
+        if count:
+            self._pending_numbers[request.number] = count
+        else:
+            del self._pending_numbers[request.number]
+        return request
+    
+    def submit(self, number, message, detected_at=None):
+        """Queue a chat to open; returns False if the request was dropped"""
+        if detected_at is None:
+            detected_at = time.monotonic()
+        request = DispatchRequest(number, message, detected_at)
+        
+        evicted = None
+        with self._condition:
+            self.submitted += 1
+            
+            if self.policy == "coalesce" and number in self._pending_numbers:
+                # Keep the original place in the queue, use the newest message
+                for index, pending in enumerate(self._pending):
+                    if pending.number == number:
+                        self._pending[index] = pending._replace(message=message)
+                        break
+                self.coalesced += 1
+                return True
+            
+            if len(self._pending) >= self.maxsize:
+                if self.policy == "drop_oldest":
+                    evicted = self._popleft()
+                    self.dropped += 1
+                elif self.policy == "block":
+                    deadline = time.monotonic() + self.block_timeout
+                    while len(self._pending) >= self.maxsize:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.dropped += 1
+                            return False
+                        self._condition.wait(remaining)
+                else:
+                    self.dropped += 1
+                    return False
+            
+            self._append(request)
+        
+        if evicted is not None and self.on_evict is not None:
+            self.on_evict(evicted)
+        return True
+    
+    def submit_batch(self, numbers, message, detected_at=None):
+        """Queue a chat for every number of a list; returns (queued, rejected)
+        
+        Lists may fill the queue beyond maxsize, up to maxsize + batch_size
+        pending requests, so copying a long column does not lose its tail
+        while the queue stays bounded. Numbers past that limit are rejected,
+        and numbers that are already waiting are not queued twice.
+        """
+        if detected_at is None:
+            detected_at = time.monotonic()
+        
+        queued = rejected = 0
+        with self._condition:
+            limit = self.maxsize + self.batch_size
+            for number in numbers:
+                self.submitted += 1
+                if number in self._pending_numbers:
+                    self.coalesced += 1
+                    continue
+                if len(self._pending) >= limit:
+                    self.dropped += 1
+                    rejected += 1
+                    continue
+                self._pending.append(DispatchRequest(number, message, detected_at, True))
+                self._pending_numbers[number] = 1
+                queued += 1
+            if queued:
+                self._condition.notify_all()
+        return queued, rejected
+    
+    def cancel_batches(self):
+        """Remove every pending list request; returns how many were removed"""
+        with self._condition:
+            kept = [request for request in self._pending if not request.batch]
+            cancelled = len(self._pending) - len(kept)
+            if cancelled:
+                self._pending = deque()
+                self._pending_numbers = {}
+                for request in kept:
+                    self._append(request)
+        return cancelled
+    
+    def pending(self):
+        """Number of requests waiting to be opened"""
+        with self._condition:
+            return len(self._pending)
+    
+    def join(self, timeout=None):
+        """Wait until every queued request has been handled"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._pending or self._busy:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+    
+    def _run(self):
+        """Worker loop: open queued chats one at a time"""
+        while True:
+            with self._condition:
+                while self._running and not self._pending:
+                    self._condition.wait()
+                if not self._running:
+                    return
+                request = self._popleft()
+                self._busy = True
+                # Wake submitters blocked on a full queue
+                self._condition.notify_all()
+            
+            try:
+                self.handler(request)
+            except Exception as e:
+                logger.error(f"Error dispatching {request.number}: {e}")
+            finally:
+                with self._condition:
+                    self._busy = False
+                    self.dispatched += 1
+                    self._condition.notify_all()
+
+class TokenBucket:
+    """Token-bucket rate limiter for chat opens
+    
+    Up to burst opens can happen back to back; after that opens are allowed at
+    rate per second. When no token is available the open is either deferred
+    until one is (overflow="queue") or dropped (overflow="drop"). Deferrals
+    longer than max_wait are dropped as well.
+    """
+    
+    OVERFLOW_POLICIES = ("queue", "drop")
+    
+    def __init__(self, rate=0.5, burst=5, overflow="queue", max_wait=60.0, clock=time.monotonic):
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate must be positive and burst at least 1")
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown rate limit overflow policy: {overflow}")
+        self.rate = rate
+        self.burst = burst
+        self.overflow = overflow
+        self.max_wait = max_wait
+        self.clock = clock
+        
+        self.allowed = 0
+        self.deferred = 0
+        self.dropped = 0
+        
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def from_config(cls, config):
+        """Build a limiter from the rate limit settings in config
+        
+        An unknown overflow policy is logged and replaced by queue rather
+        than stopping the app.
+        """
+        overflow = config.get("open_overflow", "queue")
+        if overflow not in cls.OVERFLOW_POLICIES:
+            logger.warning(f"Unknown open_overflow {overflow!r}, using queue")
+            overflow = "queue"
+        return cls(
+            rate=config.get("open_rate_per_minute", 30) / 60.0,
+            burst=config.get("open_burst", 5),
+            overflow=overflow,
+            max_wait=config.get("open_max_wait", 60.0),
+        )
+    
+    def reserve(self, always_wait=False):
+        """Take a token; returns seconds to wait before opening, or None to drop
+        
+        Deferred callers reserve their token up front, so concurrent callers
+        are released in order at the sustained rate. always_wait=True defers
+        however long the wait, whatever the overflow policy (paced lists).
+        """
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            
+            if self._tokens >= 1:
+                self._tokens -= 1
+                self.allowed += 1
+                return 0.0
+            
+            wait = (1 - self._tokens) / self.rate
+            if not always_wait and (self.overflow == "drop" or wait > self.max_wait):
+                self.dropped += 1
+                return None
+            
+            self._tokens -= 1
+            self.deferred += 1
+            return wait
+    
+    def stats(self):
+        """Counters for opens allowed immediately, deferred and dropped"""
+        return {"allowed": self.allowed, "deferred": self.deferred, "dropped": self.dropped}
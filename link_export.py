@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+wa.me link export for Smart Clipboard WhatsApp Sender
+Streams the numbers in a CSV/TXT list into a CSV, JSONL or HTML file of chat
+links, one row at a time, so any size of list fits in a small amount of memory
+"""
+
+import csv
+import html
+import json
+import os
+import sys
+
+from campaign import iter_contacts
+from message_templates import whatsapp_url
+from phone_detector import get_default_detector
+
+EXPORT_FORMATS = ("csv", "jsonl", "html")
+
+# Output buffer size; rows are collected in memory up to this size per write
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+HTML_HEADER = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>WhatsApp links</title>
+<style>
+body { font-family: Arial, sans-serif; margin: 2em; }
+td { padding: 4px 12px; border-bottom: 1px solid #ddd; }
+</style>
+</head>
+<body>
+<table>
+<tr><th>Number</th><th>Name</th><th>Chat</th></tr>
+"""
+
+HTML_FOOTER = """</table>
+</body>
+</html>
+"""
+
+def iter_links(source, message=None, detector=None):
+    """Yield (number, name, url) for every number in a CSV or TXT file"""
+    detector = detector or get_default_detector()
+    for _, number, name in iter_contacts(source, detector):
+        yield number, name, whatsapp_url(number, message, name)
+
+def guess_format(output):
+    """Pick the export format from the output file extension"""
+    extension = os.path.splitext(output)[1].lower().lstrip(".")
+    if extension in ("htm", "html"):
+        return "html"
+    if extension in ("jsonl", "ndjson", "json"):
+        return "jsonl"
+    return "csv"
+
+class CsvLinkWriter:
+    """Writes links as CSV rows"""
+    
+    def __init__(self, f):
+        self.writer = csv.writer(f)
+        self.writer.writerow(["number", "name", "url"])
+    
+    def write(self, number, name, url):
+        self.writer.writerow([number, name, url])
+    
+    def close(self):
+        pass
+
+class JsonlLinkWriter:
+    """Writes links as one JSON object per line"""
+    
+    def __init__(self, f):
+        self.f = f
+    
+    def write(self, number, name, url):
+        self.f.write(json.dumps({"number": number, "name": name, "url": url},
+                                ensure_ascii=False) + "\n")
+    
+    def close(self):
+        pass
+
+class HtmlLinkWriter:
+    """Writes links as a clickable HTML table"""
+    
+    def __init__(self, f):
+        self.f = f
+        f.write(HTML_HEADER)
+    
+    def write(self, number, name, url):
+        self.f.write(f'<tr><td>{html.escape(number)}</td><td>{html.escape(name)}</td>'
+                     f'<td><a href="{html.escape(url)}" target="_blank">Open chat</a></td></tr>\n')
+    
+    def close(self):
+        self.f.write(HTML_FOOTER)
+
+LINK_WRITERS = {"csv": CsvLinkWriter, "jsonl": JsonlLinkWriter, "html": HtmlLinkWriter}
+
+def export_links(source, output, export_format=None, message=None, detector=None):
+    """Write a wa.me link for every number in source to output; returns the link count
+    
+    output is a file path, or "-" for standard output. export_format is one
+    of EXPORT_FORMATS and defaults to the output file extension. message is an
+    optional message template pre-filled in every link.
+    """
+    if export_format is None:
+        export_format = "csv" if output == "-" else guess_format(output)
+    if export_format not in LINK_WRITERS:
+        raise ValueError(f"Unknown export format: {export_format}")
+    
+    if output == "-":
+        f = sys.stdout
+    else:
+        f = open(output, 'w', newline='', encoding='utf-8', buffering=WRITE_BUFFER_SIZE)
+    
+    count = 0
+    try:
+        writer = LINK_WRITERS[export_format](f)
+        for number, name, url in iter_links(source, message, detector):
+            writer.write(number, name, url)
+            count += 1
+        writer.close()
+    finally:
+        if f is not sys.stdout:
+            f.close()
+        else:
+            f.flush()
+    return count
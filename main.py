@@ -4,59 +4,109 @@ Smart Clipboard WhatsApp Sender
 A Windows utility that monitors clipboard for phone numbers and opens WhatsApp Web
 """
 
-import pyperclip
-import webbrowser
-import re
+import argparse
 import time
 import threading
 import json
-import os
-from urllib.parse import quote
-import tkinter as tk
-from tkinter import ttk, messagebox, scrolledtext
+import queue
+import signal
+import sys
 from datetime import datetime
 import logging
 
+from app_logging import setup_logging
+from clipboard_watchers import (
+    AdaptivePollScheduler, PollingClipboardWatcher, WatcherUnavailable, clipboard_fingerprint,
+    create_clipboard_reader, create_clipboard_watcher
+)
+from campaign import CampaignRunner
+from config_manager import ConfigManager, MonitorSettings
+from dedup_store import DuplicateStore
+from dispatch import DispatchQueue, TokenBucket
+from link_export import EXPORT_FORMATS, export_links
+from message_templates import compile_template, whatsapp_url
+from metrics import AppMetrics, MetricsServer
+from openers import HELPER_FLAG, OPENER_BACKENDS, create_openers, serve_helper
+from phone_detector import PhoneNumberDetector, reaches_end
+from phone_normalizer import PhoneNormalizer
+
+# Activity log messages are written to the GUI in batches from the Tk thread
+GUI_LOG_INTERVAL_MS = 100
+GUI_LOG_BATCH_SIZE = 500
+
 class ClipboardWhatsAppSender:
-    def __init__(self):
+    # Settings checkboxes: (Tk variable attribute, config key, default)
+    SETTINGS_VARS = [
+        ("auto_open_var", "auto_open_browser", True),
+        ("avoid_duplicates_var", "avoid_duplicates", True),
+        ("numbers_only_var", "numbers_only_mode", False),
+        ("use_whatsapp_app_var", "use_whatsapp_app", False),
+        ("multi_number_var", "multi_number_mode", False),
+    ]
+    
+    def __init__(self, headless=False, config_overrides=None):
         self.running = False
-        self.last_clipboard = ""
-        self.processed_numbers = set()
+        self.headless = headless
+        self.last_clipboard_fingerprint = None
+        self.clipboard_watcher = None
+        self.poll_scheduler = None
         self.config_file = "config.json"
         self.log_file = "clipboard_whatsapp.log"
+        # Command line settings: in effect for this run only, never saved
+        self.config_overrides = dict(config_overrides or {})
+        
+        # Load configuration (logging settings come from it)
+        self.logger = logging.getLogger(__name__)
+        self.config = self.load_config()
+        self.config_manager.save_delay = self.config.get("config_save_delay", 0.5)
+        self.config_manager.reload_interval = self.config.get("config_reload_interval", 2.0)
+        self.config_manager.add_listener(self.apply_config_changes)
+        
+        # Settings read by the monitor and opener threads; replaced as a whole
+        # whenever the config or the message box changes
+        self.message_override = None
+        self.refresh_settings()
         
         # Setup logging
         self.setup_logging()
         
-        # Load configuration
-        self.config = self.load_config()
+        # Recently opened numbers (bounded, with a cooldown per number),
+        # backed by an on-disk index so they survive restarts
+        self.processed_numbers = DuplicateStore.from_config(self.config)
+        
+        # Limits how fast chats are opened
+        self.rate_limiter = TokenBucket.from_config(self.config)
         
-        # Phone number regex patterns for global formats
-        self.phone_patterns = [
-            r'\+\d{1,3}[-.\s]?\d{1,4}[-.\s]?\d{1,4}[-.\s]?\d{1,4}[-.\s]?\d{1,4}',  # International with various separators
-            r'\+\d{1,3}\s?\d{6,14}',  # International format with +
-            r'\d{10,15}',             # Simple 10-15 digit numbers
-            r'\(\d{3}\)\s?\d{3}[-.\s]?\d{4}',  # US format (xxx) xxx-xxxx
-            r'\d{3}[-.\s]\d{3}[-.\s]\d{4}',  # US format xxx-xxx-xxxx or xxx.xxx.xxxx
-            r'\d{3}\s\d{3}\s\d{4}',   # US format with spaces
-        ]
+        # Detected numbers are opened by a dedicated worker thread
+        self.dispatcher = DispatchQueue.from_config(self.dispatch_open, self.config,
+                                                    on_evict=self.forget_evicted)
+        # Set to abandon a copied list: interrupts the open waiting for its turn
+        self.cancel_lists = threading.Event()
+        
+        # Backends that hand whatsapp:// and wa.me links to the app or browser
+        self.app_opener, self.web_opener = create_openers(self.config.get("opener_backend", "auto"))
+        
+        # Phone number detection engine (all formats compiled into one pattern);
+        # numbers without + are read as numbers of the default region
+        self.detector = self.create_detector()
+        self.phone_patterns = self.detector.patterns
+        
+        # Counters and latency histograms, optionally served on localhost
+        self.metrics = AppMetrics()
+        self.metrics_server = None
         
         # GUI components
         self.root = None
         self.status_var = None
         self.message_var = None
         self.log_text = None
+        self.gui_log_queue = queue.Queue()
+        self.gui_settings_stale = False
         
     def setup_logging(self):
         """Setup logging configuration"""
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler(self.log_file),
-                logging.StreamHandler()
-            ]
-        )
+        # Records are written by a background thread to a rotating log file
+        setup_logging(self.log_file, self.config)
         self.logger = logging.getLogger(__name__)
     
     def load_config(self):
@@ -68,135 +118,140 @@ class ClipboardWhatsAppSender:
             "avoid_duplicates": True,
             "auto_open_browser": True,
             "numbers_only_mode": False,
-            "use_whatsapp_app": False
+            "use_whatsapp_app": False,
+            "opener_backend": "auto",
+            "multi_number_mode": False,
+            "multi_number_max": 500,
+            "default_region": "US",
+            "detection_cache_size": 256,
+            "clipboard_backend": "auto",
+            "clipboard_reader": "auto",
+            "adaptive_polling": True,
+            "poll_min_interval": 0.1,
+            "poll_max_interval": 2.0,
+            "poll_backoff": 1.5,
+            "max_scan_chars": 65536,
+            "duplicate_ttl_hours": 24,
+            "duplicate_max_entries": 10000,
+            "persistent_duplicates": True,
+            "duplicates_db": "processed_numbers.db",
+            "dispatch_queue_size": 64,
+            "dispatch_policy": "coalesce",
+            "open_rate_per_minute": 30,
+            "open_burst": 5,
+            "open_overflow": "queue",
+            "gui_log_max_lines": 1000,
+            "log_max_bytes": 5242880,
+            "log_backup_count": 5,
+            "log_rotate_when": None,
+            "log_compress": True,
+            "log_format": "text",
+            "config_save_delay": 0.5,
+            "config_reload_interval": 2.0,
+            "metrics_port": 0,
+            "metrics_file": ""
         }
         
-        if os.path.exists(self.config_file):
-            try:
-                with open(self.config_file, 'r') as f:
-                    config = json.load(f)
-                    # Merge with defaults to ensure all keys exist
-                    for key, value in default_config.items():
-                        if key not in config:
-                            config[key] = value
-                    return config
-            except Exception as e:
-                self.logger.error(f"Error loading config: {e}")
-                
-        return default_config
+        # Missing keys are filled in from the defaults
+        self.config_manager = ConfigManager(self.config_file, default_config,
+                                            overrides=self.config_overrides)
+        return self.config_manager.load()
     
     def save_config(self):
-        """Save current configuration to file"""
-        try:
-            with open(self.config_file, 'w') as f:
-                json.dump(self.config, f, indent=2)
-        except Exception as e:
-            self.logger.error(f"Error saving config: {e}")
+        """Save current configuration to file now (atomically)"""
+        self.config_manager.save()
     
-    def is_valid_phone_number(self, text):
-        """Check if text contains a valid phone number"""
-        # Clean the text
-        text = text.strip()
-        
-        # Check against all patterns
-        for pattern in self.phone_patterns:
-            if re.search(pattern, text):
-                return True
-        
-        return False
+    def refresh_settings(self):
+        """Rebuild the settings snapshot from config and the message box"""
+        self.settings = MonitorSettings.from_config(self.config, self.message_override)
     
-    def is_phone_number_only(self, text):
-        """Check if text contains ONLY a phone number (no extra text)"""
-        text = text.strip()
+    def apply_config_changes(self, changed):
+        """Apply settings reloaded from an edited config file (config watcher thread)"""
+        self.refresh_settings()
         
-        # If the text is empty after stripping, it's not a valid phone number
-        if not text:
-            return False
+        if changed & {"default_region", "detection_cache_size"}:
+            self.detector = self.create_detector()
         
-        # Extract the phone number from the text
-        extracted_number = None
-        for pattern in self.phone_patterns:
-            match = re.search(pattern, text)
-            if match:
-                extracted_number = match.group()
-                break
+        if changed & {"open_rate_per_minute", "open_burst", "open_overflow", "open_max_wait"}:
+            self.rate_limiter = TokenBucket.from_config(self.config)
         
-        if not extracted_number:
-            return False
+        if changed & {"dispatch_queue_size", "dispatch_policy", "multi_number_max"}:
+            self.dispatcher.apply_config(self.config)
+        
+        if "opener_backend" in changed:
+            self.close_openers()
+            self.app_opener, self.web_opener = create_openers(self.config.get("opener_backend", "auto"))
         
-        # Clean both the original text and the extracted number for comparison
-        # Remove all non-alphanumeric characters except + for comparison
-        clean_text = re.sub(r'[^\w+]', '', text)
-        clean_number = re.sub(r'[^\w+]', '', extracted_number)
+        if self.running and changed & {"adaptive_polling", "poll_min_interval",
+                                       "poll_max_interval", "poll_backoff", "check_interval"}:
+            self.poll_scheduler = AdaptivePollScheduler.from_config(self.config)
+            if hasattr(self.clipboard_watcher, "scheduler"):
+                self.clipboard_watcher.scheduler = self.poll_scheduler
         
-        # If the cleaned text equals the cleaned number, then it's only a phone number
-        return clean_text == clean_number
+        # Tk variables are refreshed from the Tk thread (see drain_gui_log)
+        self.gui_settings_stale = True
+        self.log_to_gui(f"🔄 Settings reloaded from {self.config_file}")
+    
+    def create_detector(self):
+        """Build the detector from the region and cache settings in config"""
+        return PhoneNumberDetector(
+            normalizer=PhoneNormalizer.from_config(self.config),
+            cache_size=self.config.get("detection_cache_size", 256),
+        )
+    
+    def is_valid_phone_number(self, text):
+        """Check if text contains a valid phone number"""
+        return self.detector.contains_phone_number(text)
+    
+    def is_phone_number_only(self, text):
+        """Check if text contains ONLY a phone number (no extra text)"""
+        return self.detector.is_phone_number_only(text)
     
     def extract_phone_number(self, text):
         """Extract and clean phone number from text"""
-        # Try each pattern
-        for pattern in self.phone_patterns:
-            match = re.search(pattern, text)
-            if match:
-                number = match.group()
-                # Clean the number - remove all non-digit characters except +
-                cleaned = re.sub(r'[^\d+]', '', number)
-                
-                # Handle different number formats
-                if cleaned.startswith('+'):
-                    # Already has country code
-                    return cleaned
-                elif len(cleaned) == 10:
-                    # Likely US number without country code
-                    return '+1' + cleaned
-                elif len(cleaned) == 11 and cleaned.startswith('1'):
-                    # US number with 1 prefix
-                    return '+' + cleaned
-                elif len(cleaned) >= 10:
-                    # International number without + prefix
-                    # For common country codes, try to detect
-                    if cleaned.startswith('44'):  # UK
-                        return '+' + cleaned
-                    elif cleaned.startswith('971'):  # UAE
-                        return '+' + cleaned
-                    elif cleaned.startswith('91'):  # India
-                        return '+' + cleaned
-                    else:
-                        # Default: add + prefix
-                        return '+' + cleaned
-                
-                return cleaned if cleaned else None
-        
-        return None
+        return self.detector.extract_phone_number(text)
+    
+    def iter_phone_numbers(self, source):
+        """Lazily yield every phone number in a str, bytes or file-like source"""
+        return self.detector.iter_phone_numbers(source)
     
-    def generate_whatsapp_url(self, phone_number, message=None):
+    def encode_message(self, message, phone_number, name=""):
+        """Fill in the message placeholders and URL-encode the result"""
+        # Templates are compiled once; only placeholder values are encoded per chat
+        return compile_template(message).render_encoded(number=phone_number, name=name)
+    
+    def generate_whatsapp_url(self, phone_number, message=None, name=""):
         """Generate WhatsApp Web URL"""
         if message is None:
             message = self.config.get("default_message", "Hello!")
         
-        # Encode the message for URL
-        encoded_message = quote(message)
-        
-        # Remove + from phone number for URL
-        clean_number = phone_number.replace('+', '')
-        
-        # Generate WhatsApp URL
-        url = f"https://wa.me/{clean_number}?text={encoded_message}"
-        
-        return url
+        # Generate WhatsApp URL (message placeholders filled in and encoded)
+        return whatsapp_url(phone_number, message, name)
     
-    def open_whatsapp(self, phone_number, message=None):
-        """Open WhatsApp (app or web) with the phone number"""
+    def open_whatsapp(self, phone_number, message=None, name="", rate_limited=True, paced=False):
+        """Open WhatsApp (app or web) with the phone number
+        
+        rate_limited=False is for callers that pace opens themselves;
+        paced=True waits for the rate limiter however long it takes instead
+        of dropping the chat (numbers from a copied list).
+        """
         try:
+            settings = self.settings
             if message is None:
-                message = self.config.get("default_message", "Hello!")
+                message = settings.message
             
             # Check if we should use WhatsApp desktop app
-            use_app = self.config.get("use_whatsapp_app", False)
+            use_app = settings.use_whatsapp_app
+            
+            # Keep launches under the configured rate (no limit when only
+            # generating URLs)
+            if rate_limited and (use_app or settings.auto_open_browser):
+                if not self.wait_for_rate_limit(phone_number, paced):
+                    return False
             
             if use_app:
                 # Try to open WhatsApp desktop app
-                success = self.open_whatsapp_app(phone_number, message)
+                success = self.open_whatsapp_app(phone_number, message, name)
                 if success:
                     return True
                 else:
@@ -204,62 +259,86 @@ class ClipboardWhatsAppSender:
                     self.log_to_gui("⚠️ WhatsApp app not found, using web version...")
             
             # Open WhatsApp Web
-            return self.open_whatsapp_web(phone_number, message)
+            return self.open_whatsapp_web(phone_number, message, name)
                 
         except Exception as e:
             self.logger.error(f"Error opening WhatsApp: {e}")
             self.log_to_gui(f"❌ Error opening WhatsApp: {e}")
+            self.metrics.open_failures.inc()
             return False
     
-    def open_whatsapp_app(self, phone_number, message):
-        """Try to open WhatsApp desktop app"""
-        import subprocess
-        import os
+    def wait_for_rate_limit(self, phone_number, paced=False):
+        """Wait for the open rate limiter; returns False if the open was dropped"""
+        wait = self.rate_limiter.reserve(always_wait=paced)
+        stats = self.rate_limiter.stats()
+        
+        if wait is None:
+            self.logger.warning(f"Rate limit reached, dropped {phone_number}")
+            self.log_to_gui(f"⛔ Rate limit reached, skipped {phone_number} ({stats['dropped']} dropped)")
+            self.metrics.dropped.inc()
+            return False
         
+        if wait > 0 and paced:
+            # Expected while working through a list; not worth a line each
+            if self.cancel_lists.wait(wait):
+                return False
+        elif wait > 0:
+            self.logger.info(f"Rate limit reached, opening {phone_number} in {wait:.1f}s")
+            self.log_to_gui(f"⏳ Rate limit reached, opening {phone_number} in {wait:.1f}s ({stats['deferred']} deferred)")
+            time.sleep(wait)
+        
+        return True
+    
+    def open_whatsapp_app(self, phone_number, message, name=""):
+        """Try to open WhatsApp desktop app"""
         try:
             # Clean phone number (remove + for the URL)
             clean_number = phone_number.replace('+', '')
             
             # Encode the message for URL
-            encoded_message = quote(message)
+            encoded_message = self.encode_message(message, phone_number, name)
             
             # WhatsApp desktop app URL scheme
             whatsapp_url = f"whatsapp://send?phone={clean_number}&text={encoded_message}"
             
             # Try to open with the URL scheme
-            if os.name == 'nt':  # Windows
-                subprocess.run(['start', whatsapp_url], shell=True, check=True)
-            else:  # macOS/Linux
-                subprocess.run(['open', whatsapp_url], check=True)
+            if not self.app_opener.open(whatsapp_url):
+                self.logger.warning("WhatsApp desktop app not available")
+                return False
             
             self.logger.info(f"Opened WhatsApp app for {phone_number}")
             self.log_to_gui(f"📱 Opened WhatsApp app for {phone_number}")
+            self.metrics.opens.inc()
             return True
             
-        except subprocess.CalledProcessError:
-            self.logger.warning("WhatsApp desktop app not available")
-            return False
         except Exception as e:
             self.logger.warning(f"Failed to open WhatsApp app: {e}")
             return False
     
-    def open_whatsapp_web(self, phone_number, message):
+    def open_whatsapp_web(self, phone_number, message, name=""):
         """Open WhatsApp Web with the phone number"""
         try:
-            url = self.generate_whatsapp_url(phone_number, message)
+            url = self.generate_whatsapp_url(phone_number, message, name)
             
-            if self.config.get("auto_open_browser", True):
-                webbrowser.open(url)
+            if self.settings.auto_open_browser:
+                if not self.web_opener.open(url):
+                    self.logger.error(f"No browser could open WhatsApp Web for {phone_number}")
+                    self.log_to_gui(f"❌ Could not open a browser for {phone_number}")
+                    self.metrics.open_failures.inc()
+                    return False
                 self.logger.info(f"Opened WhatsApp Web for {phone_number}")
                 self.log_to_gui(f"🌐 Opened WhatsApp Web for {phone_number}")
+                self.metrics.opens.inc()
                 return True
             else:
                 self.logger.info(f"Generated URL for {phone_number}: {url}")
                 self.log_to_gui(f"📋 Generated URL for {phone_number}")
+                self.metrics.opens.inc()
                 return url
                 
         except Exception as e:
             self.logger.error(f"Error opening WhatsApp Web: {e}")
+            self.metrics.open_failures.inc()
             return False
     
     def monitor_clipboard(self):
@@ -267,82 +346,264 @@ class ClipboardWhatsAppSender:
         self.logger.info("Started clipboard monitoring")
         self.log_to_gui("🔍 Started clipboard monitoring...")
         
-        while self.running:
-            try:
-                # Get current clipboard content
-                current_clipboard = pyperclip.paste()
-                
-                # Check if clipboard content changed
-                if current_clipboard != self.last_clipboard and current_clipboard.strip():
-                    self.last_clipboard = current_clipboard
-                    
-                    # Check detection mode
-                    numbers_only_mode = self.config.get("numbers_only_mode", False)
-                    
-                    # Determine if we should process this clipboard content
-                    should_process = False
+        watcher = self.start_clipboard_watcher()
+        metrics = self.metrics
+        
+        # Check whatever is already on the clipboard first
+        changed = True
+        
+        try:
+            while self.running:
+                try:
+                    if changed:
+                        # Get current clipboard content
+                        started = time.perf_counter()
+                        activity = self.check_clipboard(watcher.read())
+                        metrics.poll_seconds.observe(time.perf_counter() - started)
+                        metrics.polls.inc()
+                        self.poll_scheduler.record_activity(activity)
                     
-                    if numbers_only_mode:
-                        # Only process if clipboard contains ONLY a phone number
-                        if self.is_phone_number_only(current_clipboard):
-                            should_process = True
-                        else:
-                            # Log that we're skipping due to extra text
-                            if self.is_valid_phone_number(current_clipboard):
-                                self.log_to_gui(f"⏭️ Skipping (contains extra text): {current_clipboard[:30]}...")
-                    else:
-                        # Process if clipboard contains any valid phone number
-                        if self.is_valid_phone_number(current_clipboard):
-                            should_process = True
+                    # Wait for the next change (or adaptive poll interval)
+                    changed = watcher.wait_for_change()
                     
-                    if should_process:
-                        phone_number = self.extract_phone_number(current_clipboard)
-                        
-                        if phone_number:
-                            # Check for duplicates if enabled
-                            if self.config.get("avoid_duplicates", True):
-                                if phone_number in self.processed_numbers:
-                                    self.log_to_gui(f"⚠️ Skipping duplicate: {phone_number}")
-                                    time.sleep(self.config.get("check_interval", 1.0))
-                                    continue
-                            
-                            # Add to processed numbers immediately to prevent double processing
-                            self.processed_numbers.add(phone_number)
-                            
-                            # Log the detection
-                            self.logger.info(f"Detected phone number: {phone_number}")
-                            self.log_to_gui(f"📞 Detected: {phone_number}")
-                            
-                            # Add a small delay to prevent rapid duplicate processing
-                            time.sleep(0.5)
-                            
-                            # Open WhatsApp
-                            message = self.config.get("default_message", "Hello!")
-                            if hasattr(self, 'message_var') and self.message_var:
-                                custom_message = self.message_var.get()
-                                if custom_message.strip():
-                                    message = custom_message.strip()
-                            
-                            self.open_whatsapp(phone_number, message)
-                            message = self.config.get("default_message", "Hello!")
-                            if hasattr(self, 'message_var') and self.message_var:
-                                custom_message = self.message_var.get()
-                                if custom_message.strip():
-                                    message = custom_message.strip()
-                            
-                            self.open_whatsapp(phone_number, message)
+                except WatcherUnavailable as e:
+                    # Such as a lost X connection: keep monitoring by polling
+                    self.logger.warning(f"{watcher.name} clipboard watcher stopped working ({e}), using polling")
+                    watcher.close()
+                    watcher = self.use_polling_watcher(watcher)
+                    changed = True
+                except Exception as e:
+                    self.logger.error(f"Error in clipboard monitoring: {e}")
+                    metrics.poll_errors.inc()
+                    # Back off while errors persist
+                    self.poll_scheduler.record_error()
+                    time.sleep(self.poll_scheduler.next_interval())
+                    changed = True
+        finally:
+            watcher.close()
+    
+    def start_clipboard_watcher(self):
+        """Start the configured clipboard watcher, falling back to polling"""
+        watcher = self.clipboard_watcher
+        try:
+            watcher.start()
+        except Exception as e:
+            self.logger.warning(f"{watcher.name} clipboard watcher unavailable ({e}), using polling")
+            watcher = self.use_polling_watcher(watcher)
+        
+        self.logger.info(f"Using {watcher.name} clipboard watcher")
+        return watcher
+    
+    def use_polling_watcher(self, watcher):
+        """Replace watcher with a started polling watcher that reads the clipboard the same way"""
+        watcher = PollingClipboardWatcher(self.settings.check_interval,
+                                          paste=watcher.paste, scheduler=self.poll_scheduler)
+        watcher.start()
+        self.clipboard_watcher = watcher
+        return watcher
+    
+    def check_clipboard(self, current_clipboard):
+        """Process clipboard content; returns True if the clipboard had changed"""
+        if not current_clipboard or current_clipboard.isspace():
+            return False
+        
+        # Check if clipboard content changed without keeping a copy of it
+        fingerprint = clipboard_fingerprint(current_clipboard)
+        if fingerprint == self.last_clipboard_fingerprint:
+            return False
+        
+        self.last_clipboard_fingerprint = fingerprint
+        noticed_at = time.monotonic()
+        
+        # One consistent set of settings for this clipboard change
+        settings = self.settings
+        
+        # Check detection mode
+        numbers_only_mode = settings.numbers_only_mode
+        
+        # Only scan a bounded prefix of huge clipboard contents
+        max_scan_chars = settings.max_scan_chars
+        truncated = len(current_clipboard) > max_scan_chars
+        if truncated:
+            current_clipboard = current_clipboard[:max_scan_chars]
+        
+        # Detect, check "numbers only" and normalize in one scan; text copied
+        # again later is answered from the cache by its fingerprint
+        if settings.multi_number_mode:
+            self.queue_all_numbers(current_clipboard, truncated, settings, noticed_at)
+            return True
+        
+        started = time.perf_counter()
+        detection = self.detector.detect(current_clipboard,
+                                         key=(fingerprint, len(current_clipboard)))
+        self.metrics.detect_seconds.observe(time.perf_counter() - started)
+        if detection and truncated and reaches_end(current_clipboard, detection.end):
+            # The rest of the number was cut off; its first digits would open the wrong chat
+            self.log_to_gui(f"⏭️ Skipping number cut off at {max_scan_chars} characters")
+            detection = None
+        
+        # Determine if we should process this clipboard content
+        should_process = False
+        
+        if detection:
+            if numbers_only_mode and (truncated or not detection.is_only):
+                # Log that we're skipping due to extra text
+                self.log_to_gui(f"⏭️ Skipping (contains extra text): {current_clipboard[:30]}...")
+            else:
+                should_process = True
+        
+        if should_process:
+            phone_number = detection.number
+            
+            if phone_number:
+                # Check for duplicates if enabled
+                if settings.avoid_duplicates:
+                    if phone_number in self.processed_numbers:
+                        self.log_to_gui(f"⚠️ Skipping duplicate: {phone_number}")
+                        self.metrics.duplicates.inc()
+                        return True
                 
-                # Sleep before next check
-                time.sleep(self.config.get("check_interval", 1.0))
+                # Add to processed numbers immediately to prevent double processing
+                self.processed_numbers.add(phone_number)
                 
-            except Exception as e:
-                self.logger.error(f"Error in clipboard monitoring: {e}")
-                time.sleep(2.0)  # Wait longer on error
+                # Log the detection
+                self.logger.info(f"Detected phone number: {phone_number}")
+                self.log_to_gui(f"📞 Detected: {phone_number}")
+                self.metrics.detections.inc()
+                
+                # Hand the number to the opener worker so launching the
+                # browser or app never blocks clipboard monitoring
+                if not self.dispatcher.submit(phone_number, settings.message, detected_at=noticed_at):
+                    self.logger.warning(f"Open queue full, dropped {phone_number}")
+                    self.log_to_gui(f"⚠️ Too many pending chats, skipped {phone_number}")
+                    self.metrics.dropped.inc()
+                    # Not opened, so copying it again later should work
+                    self.processed_numbers.discard(phone_number)
+        
+        return True
+    
+    def queue_all_numbers(self, text, truncated, settings, noticed_at):
+        """Queue a chat for every distinct number in clipboard text (multi-number mode)"""
+        started = time.perf_counter()
+        numbers, is_only = self.detector.detect_all(text, truncated)
+        self.metrics.detect_seconds.observe(time.perf_counter() - started)
+        if not numbers:
+            return
+        
+        if settings.numbers_only_mode and (truncated or not is_only):
+            self.log_to_gui(f"⏭️ Skipping (contains extra text): {text[:30]}...")
+            return
+        
+        found = len(numbers)
+        if settings.avoid_duplicates:
+            numbers = [number for number in numbers if number not in self.processed_numbers]
+        duplicates = found - len(numbers)
+        self.metrics.duplicates.inc(duplicates)
+        
+        over_limit = max(0, len(numbers) - settings.multi_number_max)
+        if over_limit:
+            numbers = numbers[:settings.multi_number_max]
+        
+        self.logger.info(f"Detected {found} phone numbers ({duplicates} duplicates)")
+        self.log_to_gui(f"📞 Detected {found} numbers ({duplicates} duplicates skipped)")
+        if over_limit:
+            self.log_to_gui(f"⚠️ Only the first {settings.multi_number_max} numbers are opened, "
+                            f"skipped {over_limit}")
+        if not numbers:
+            return
+        
+        # Numbers are recorded as duplicates when their chat opens, and
+        # opened one by one at the rate limit
+        self.cancel_lists.clear()
+        queued, rejected = self.dispatcher.submit_batch(numbers, settings.message, detected_at=noticed_at)
+        self.metrics.detections.inc(queued)
+        if rejected:
+            self.logger.warning(f"Open queue full, dropped {rejected} numbers of a list")
+            self.log_to_gui(f"⚠️ Too many pending chats, skipped {rejected} numbers")
+            self.metrics.dropped.inc(rejected)
+        if queued:
+            per_minute = self.config.get("open_rate_per_minute", 30)
+            self.log_to_gui(f"📋 Queued {queued} chats, opening up to {per_minute} per minute")
+    
+    def dispatch_open(self, request):
+        """Open WhatsApp for a queued request (runs on the opener worker thread)"""
+        started = time.perf_counter()
+        if request.batch:
+            result = self.open_whatsapp(request.number, request.message, paced=True)
+            if result:
+                self.processed_numbers.add(request.number)
+        else:
+            result = self.open_whatsapp(request.number, request.message)
+            if not result:
+                # Dropped by the rate limiter or failed: a later copy may try again
+                self.processed_numbers.discard(request.number)
+        self.metrics.open_seconds.observe(time.perf_counter() - started)
+        if result:
+            # From noticing the copied number to its chat being open
+            self.metrics.copy_to_open_seconds.observe(time.monotonic() - request.detected_at)
+    
+    def forget_evicted(self, request):
+        """A queued chat was pushed out by a newer one (drop_oldest policy)"""
+        self.logger.warning(f"Open queue full, dropped {request.number}")
+        self.log_to_gui(f"⚠️ Too many pending chats, skipped {request.number}")
+        self.metrics.dropped.inc()
+        # Not opened, so copying it again later should work
+        self.processed_numbers.discard(request.number)
+    
+    def close_openers(self):
+        """Stop opener backends (such as the helper process)"""
+        self.app_opener.close()
+        if self.web_opener is not self.app_opener:
+            self.web_opener.close()
+    
+    def start_metrics_server(self):
+        """Serve metrics on localhost if metrics_port is set"""
+        port = self.config.get("metrics_port", 0)
+        if not port or self.metrics_server is not None:
+            return
+        server = MetricsServer(self.metrics.registry, port)
+        try:
+            server.start()
+        except OSError as e:
+            self.logger.warning(f"Metrics endpoint unavailable on port {port}: {e}")
+            return
+        self.metrics_server = server
+        self.log_to_gui(f"📈 Metrics on http://127.0.0.1:{server.port}/metrics")
+    
+    def stop_metrics(self):
+        """Stop the metrics endpoint and write the JSON dump if metrics_file is set"""
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+            self.metrics_server = None
+        path = self.config.get("metrics_file")
+        if path:
+            try:
+                self.metrics.registry.dump_json(path)
+            except OSError as e:
+                self.logger.warning(f"Could not write metrics to {path}: {e}")
+    
+    def prepare_monitoring(self):
+        """Start the opener worker and set up the clipboard watcher"""
+        self.running = True
+        self.dispatcher.start()
+        self.config_manager.start_watching()
+        self.refresh_settings()
+        self.start_metrics_server()
+        self.poll_scheduler = AdaptivePollScheduler.from_config(self.config)
+        if self.clipboard_watcher is None:
+            self.clipboard_watcher = create_clipboard_watcher(
+                self.config.get("clipboard_backend", "auto"),
+                self.settings.check_interval,
+                self.poll_scheduler,
+                paste=create_clipboard_reader(self.config.get("clipboard_reader", "auto"))
+            )
+        elif hasattr(self.clipboard_watcher, "scheduler"):
+            self.clipboard_watcher.scheduler = self.poll_scheduler
     
     def start_monitoring(self):
         """Start clipboard monitoring in background thread"""
         if not self.running:
-            self.running = True
+            self.prepare_monitoring()
             self.monitor_thread = threading.Thread(target=self.monitor_clipboard, daemon=True)
             self.monitor_thread.start()
             self.update_status("Running")
@@ -350,8 +611,15 @@ class ClipboardWhatsAppSender:
     def stop_monitoring(self):
         """Stop clipboard monitoring"""
         self.running = False
+        if self.clipboard_watcher:
+            self.clipboard_watcher.stop()
         self.update_status("Stopped")
         self.log_to_gui("🛑 Clipboard monitoring stopped")
+        self.cancel_number_lists()
+        
+        stats = self.detector.cache_stats().get("detection")
+        if stats:
+            self.logger.info(f"Detection cache: {stats['hits']} hits, {stats['misses']} misses")
     
     def update_status(self, status):
         """Update status in GUI"""
@@ -359,14 +627,58 @@ class ClipboardWhatsAppSender:
             self.status_var.set(f"Status: {status}")
     
     def log_to_gui(self, message):
-        """Add log message to GUI"""
+        """Queue a log message for the GUI (safe to call from any thread)"""
         if self.log_text:
             timestamp = datetime.now().strftime("%H:%M:%S")
-            self.log_text.insert(tk.END, f"[{timestamp}] {message}\n")
-            self.log_text.see(tk.END)
+            self.gui_log_queue.put(f"[{timestamp}] {message}\n")
+        elif self.headless:
+            # No window: events worth keeping are logged by the caller, so
+            # these only show up at debug level
+            self.logger.debug(message)
+    
+    def drain_gui_log(self):
+        """Write queued log messages to the GUI in one batch (Tk thread only)"""
+        lines = []
+        try:
+            while len(lines) < GUI_LOG_BATCH_SIZE:
+                lines.append(self.gui_log_queue.get_nowait())
+        except queue.Empty:
+            pass
+        
+        if lines and self.log_text:
+            self.log_text.insert("end", "".join(lines))
+            
+            # Keep only the most recent lines so the widget stays small (every
+            # message ends with a newline, so the line at end-1c is empty)
+            max_lines = self.config.get("gui_log_max_lines", 1000)
+            line_count = int(self.log_text.index("end-1c").split(".")[0]) - 1
+            if line_count > max_lines:
+                self.log_text.delete("1.0", f"{line_count - max_lines + 1}.0")
+            
+            self.log_text.see("end")
+        
+        if self.gui_settings_stale:
+            self.gui_settings_stale = False
+            self.refresh_settings_vars()
+        
+        if self.root:
+            self.root.after(GUI_LOG_INTERVAL_MS, self.drain_gui_log)
+    
+    def refresh_settings_vars(self):
+        """Show the current config in the settings widgets (Tk thread only)"""
+        if self.message_var:
+            self.message_var.set(self.config.get("default_message", "Hello!"))
+        for name, key, default in self.SETTINGS_VARS:
+            variable = getattr(self, name, None)
+            if variable is not None:
+                variable.set(self.config.get(key, default))
     
     def create_gui(self):
         """Create the GUI interface"""
+        # GUI toolkit is only loaded when a window is actually needed
+        import tkinter as tk
+        from tkinter import ttk, scrolledtext
+        
         self.root = tk.Tk()
         self.root.title("Smart Clipboard WhatsApp Sender")
         self.root.geometry("600x500")
@@ -414,6 +726,8 @@ class ClipboardWhatsAppSender:
         message_frame.columnconfigure(0, weight=1)
         
         self.message_var = tk.StringVar(value=self.config.get("default_message", "Hello!"))
+        # Unsaved edits are used for new chats too
+        self.message_var.trace_add("write", self.on_message_changed)
         message_entry = ttk.Entry(message_frame, textvariable=self.message_var, width=60)
         message_entry.grid(row=0, column=0, sticky="ew", padx=(0, 10))
         
@@ -449,6 +763,12 @@ class ClipboardWhatsAppSender:
                                          command=self.save_settings)
         whatsapp_app_cb.grid(row=2, column=0, sticky=tk.W, columnspan=2, pady=(5, 0))
         
+        self.multi_number_var = tk.BooleanVar(value=self.config.get("multi_number_mode", False))
+        multi_number_cb = ttk.Checkbutton(settings_frame, text="Open every number in a copied list",
+                                         variable=self.multi_number_var,
+                                         command=self.save_settings)
+        multi_number_cb.grid(row=3, column=0, sticky=tk.W, columnspan=2, pady=(5, 0))
+        
         # Log display
         log_frame = ttk.LabelFrame(main_frame, text="Activity Log", padding="10")
         log_frame.grid(row=5, column=0, columnspan=3, sticky="nsew", pady=(0, 10))
@@ -458,6 +778,7 @@ class ClipboardWhatsAppSender:
         
         self.log_text = scrolledtext.ScrolledText(log_frame, height=10, width=70)
         self.log_text.grid(row=0, column=0, sticky="nsew")
+        self.root.after(GUI_LOG_INTERVAL_MS, self.drain_gui_log)
         
         # Instructions
         instructions = (
@@ -468,7 +789,8 @@ class ClipboardWhatsAppSender:
             "4. Customize the default message above as needed\n"
             "5. Enable 'Numbers only' to process only standalone numbers\n"
             "6. Enable 'WhatsApp desktop app' to use installed app instead of web\n"
-            "   (ignores numbers mixed with other text)"
+            "   (ignores numbers mixed with other text)\n"
+            "7. Enable 'Open every number' to open a chat for each number in a copied list"
         )
         self.log_to_gui(instructions)
         
@@ -477,41 +799,219 @@ class ClipboardWhatsAppSender:
         
         return self.root
     
+    def on_message_changed(self, *args):
+        """Use the message box text for new chats (Tk thread)"""
+        self.message_override = self.message_var.get()
+        self.refresh_settings()
+    
     def save_message(self):
         """Save the default message"""
         if self.message_var:
             self.config["default_message"] = self.message_var.get()
-            self.save_config()
+            self.refresh_settings()
+            self.config_manager.schedule_save()
             self.log_to_gui("💾 Default message saved")
     
     def save_settings(self):
         """Save settings changes"""
-        if hasattr(self, 'auto_open_var'):
-            self.config["auto_open_browser"] = self.auto_open_var.get()
-        if hasattr(self, 'avoid_duplicates_var'):
-            self.config["avoid_duplicates"] = self.avoid_duplicates_var.get()
-        if hasattr(self, 'numbers_only_var'):
-            self.config["numbers_only_mode"] = self.numbers_only_var.get()
-        if hasattr(self, 'use_whatsapp_app_var'):
-            self.config["use_whatsapp_app"] = self.use_whatsapp_app_var.get()
-        self.save_config()
+        for name, key, default in self.SETTINGS_VARS:
+            if hasattr(self, name):
+                self.config[key] = getattr(self, name).get()
+        self.refresh_settings()
+        # Rapid checkbox clicks end up as a single write
+        self.config_manager.schedule_save()
         self.log_to_gui("⚙️ Settings saved")
     
+    def cancel_number_lists(self):
+        """Drop chats still queued from copied lists (multi-number mode)"""
+        self.cancel_lists.set()
+        cancelled = self.dispatcher.cancel_batches()
+        if cancelled:
+            self.logger.info(f"Cancelled {cancelled} queued chats")
+            self.log_to_gui(f"🚫 Cancelled {cancelled} queued chats")
+    
     def clear_duplicates(self):
-        """Clear the processed numbers set"""
+        """Clear the processed numbers store"""
+        self.cancel_number_lists()
         self.processed_numbers.clear()
         self.log_to_gui("🗑️ Duplicate detection cleared")
     
     def on_closing(self):
         """Handle application closing"""
         self.stop_monitoring()
+        self.dispatcher.stop(timeout=1.0)
+        self.close_openers()
+        self.stop_metrics()
+        self.config_manager.stop()
         self.save_config()
+        self.processed_numbers.close()
         if self.root:
             self.root.destroy()
+    
+    def run_headless(self):
+        """Monitor the clipboard on the current thread without a GUI"""
+        self.prepare_monitoring()
+        
+        # Stop cleanly when a service manager asks us to
+        try:
+            signal.signal(signal.SIGTERM, lambda signum, frame: self.stop_monitoring())
+        except ValueError:
+            pass  # Not on the main thread
+        
+        try:
+            self.monitor_clipboard()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.running = False
+            self.logger.info("Stopped clipboard monitoring")
+            self.dispatcher.stop(timeout=1.0)
+            self.close_openers()
+            self.stop_metrics()
+            self.config_manager.stop()
+            self.processed_numbers.close()
+
+def parse_args(argv=None):
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description="Monitor the clipboard for phone numbers and open WhatsApp chats"
+    )
+    parser.add_argument("--headless", action="store_true",
+                        help="run without the GUI (console logging only)")
+    parser.add_argument("--log-format", choices=["text", "json"],
+                        help="console/file log format (default: from config.json)")
+    parser.add_argument("--startup-report", metavar="FILE",
+                        help="measure startup, write timings as JSON to FILE and exit")
+    parser.add_argument("--opener", choices=OPENER_BACKENDS,
+                        help="how chats are opened (default: opener_backend from config.json)")
+    # Internal: run as the opener helper process of a frozen build
+    parser.add_argument(HELPER_FLAG, action="store_true", dest="opener_helper", help=argparse.SUPPRESS)
+    
+    commands = parser.add_subparsers(dest="command")
+    campaign = commands.add_parser("campaign", help="open chats for every number in a CSV/TXT file")
+    campaign.add_argument("source", help="CSV (with a number/phone column) or TXT file of numbers")
+    campaign.add_argument("--message", help="message template (default: from config.json)")
+    campaign.add_argument("--rate", type=float, metavar="PER_MINUTE",
+                          help="chats opened per minute (default: open_rate_per_minute)")
+    campaign.add_argument("--checkpoint", metavar="FILE",
+                          help="progress file (default: SOURCE.checkpoint.json)")
+    campaign.add_argument("--restart", action="store_true",
+                          help="ignore the checkpoint and start from the first row")
+    
+    export = commands.add_parser("export", help="write wa.me links for every number in a CSV/TXT file")
+    export.add_argument("source", help="CSV (with a number/phone column) or TXT file of numbers")
+    export.add_argument("output", help="output file (.csv, .jsonl or .html), or - for standard output")
+    export.add_argument("--format", choices=EXPORT_FORMATS,
+                        help="output format (default: from the output file extension)")
+    export.add_argument("--message", help="message template pre-filled in the links (default: none)")
+    return parser.parse_args(argv)
+
+def run_export(args, config_overrides=None):
+    """Export wa.me links from the command line; returns the exit code"""
+    app = ClipboardWhatsAppSender(headless=True, config_overrides=config_overrides)
+    try:
+        count = export_links(args.source, args.output, args.format, args.message, app.detector)
+    finally:
+        app.config_manager.stop()
+        app.processed_numbers.close()
+    app.logger.info(f"Exported {count} links to {args.output}")
+    return 0
 
-def main():
+def run_campaign(args, config_overrides=None):
+    """Run a bulk campaign from the command line; returns the exit code"""
+    app = ClipboardWhatsAppSender(headless=True, config_overrides=config_overrides)
+    runner = CampaignRunner(app, args.source, checkpoint_path=args.checkpoint,
+                            message=args.message, rate_per_minute=args.rate)
+    
+    if args.restart:
+        runner.reset()
+    elif runner.is_finished():
+        app.logger.info(f"Campaign for {args.source} already finished; use --restart to run it again")
+        return 0
+    
+    try:
+        signal.signal(signal.SIGTERM, lambda signum, frame: runner.stop())
+    except ValueError:
+        pass  # Not on the main thread
+    
+    try:
+        return 0 if runner.run() else 1
+    except KeyboardInterrupt:
+        app.logger.info(f"Campaign interrupted at row {runner.stats['row']}; run again to resume")
+        return 1
+    finally:
+        app.close_openers()
+        app.config_manager.stop()
+        app.processed_numbers.close()
+
+def write_startup_report(path, headless=False, config_overrides=None):
+    """Time construction, GUI creation and the first clipboard poll, then exit
+    
+    Used by bench_startup.py; works the same in source and frozen builds.
+    """
+    timings = {}
+    
+    started = time.perf_counter()
+    app = ClipboardWhatsAppSender(headless=headless, config_overrides=config_overrides)
+    timings["constructor_s"] = time.perf_counter() - started
+    
+    root = None
+    if not headless:
+        step = time.perf_counter()
+        root = app.create_gui()
+        root.update()
+        timings["gui_s"] = time.perf_counter() - step
+    
+    # Time until the monitor has looked at the clipboard once
+    step = time.perf_counter()
+    app.prepare_monitoring()
+    watcher = app.start_clipboard_watcher()
+    try:
+        watcher.read()
+        timings["first_poll_ok"] = True
+    except Exception as e:
+        app.logger.warning(f"First clipboard poll failed: {e}")
+        timings["first_poll_ok"] = False
+    timings["first_poll_s"] = time.perf_counter() - step
+    timings["ready_s"] = time.perf_counter() - started
+    timings["frozen"] = bool(getattr(sys, "frozen", False))
+    
+    app.running = False
+    watcher.close()
+    app.dispatcher.stop(timeout=1.0)
+    if root:
+        root.destroy()
+    
+    with open(path, 'w') as f:
+        json.dump(timings, f, indent=2)
+
+def main(argv=None):
     """Main function"""
-    app = ClipboardWhatsAppSender()
+    args = parse_args(argv)
+    if args.opener_helper:
+        return serve_helper()
+    
+    config_overrides = {}
+    if args.log_format:
+        config_overrides["log_format"] = args.log_format
+    if args.opener:
+        config_overrides["opener_backend"] = args.opener
+    
+    if args.startup_report:
+        write_startup_report(args.startup_report, args.headless, config_overrides)
+        return
+    
+    if args.command == "campaign":
+        return run_campaign(args, config_overrides)
+    if args.command == "export":
+        return run_export(args, config_overrides)
+    
+    app = ClipboardWhatsAppSender(headless=args.headless, config_overrides=config_overrides)
+    
+    if args.headless:
+        # Kiosk/scripted use: no Tk at all
+        app.run_headless()
+        return
     
     # Create and run GUI
     root = app.create_gui()
@@ -520,4 +1020,4 @@ def main():
     root.mainloop()
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Message templates for Smart Clipboard WhatsApp Sender
+Messages may contain {number}, {date} and {name} placeholders. A template is
+parsed and its static text URL-encoded once; each chat only encodes the values
+"""
+
+import functools
+from datetime import datetime
+from string import Formatter
+from urllib.parse import quote
+
+# Placeholders a message can use
+TEMPLATE_FIELDS = ("number", "date", "name")
+
+DATE_FORMAT = "%Y-%m-%d"
+
+class MessageTemplate:
+    """A message compiled into static fragments and placeholder fields"""
+    
+    def __init__(self, text):
+        self.text = text
+        # Alternating parts: str for static text, tuple (field,) for a placeholder
+        self.parts = []
+        self.encoded_parts = []
+        
+        for literal, field in self._parse(text):
+            if literal:
+                self.parts.append(literal)
+                self.encoded_parts.append(quote(literal))
+            if field:
+                self.parts.append((field,))
+                self.encoded_parts.append((field,))
+        
+        self.fields = frozenset(part[0] for part in self.parts if isinstance(part, tuple))
+        
+        # Messages without placeholders are sent exactly as written
+        self.encoded_text = None
+        if not self.fields:
+            self.parts = [text] if text else []
+            self.encoded_text = quote(text)
+            self.encoded_parts = [self.encoded_text] if text else []
+    
+    @staticmethod
+    def _parse(text):
+        """Yield (literal, field) pairs; unknown placeholders stay as text"""
+        try:
+            parsed = list(Formatter().parse(text))
+        except ValueError:
+            # Unbalanced braces: the whole message is plain text
+            yield text, None
+            return
+        
+        for literal, field, format_spec, conversion in parsed:
+            if field is None:
+                yield literal, None
+            elif field in TEMPLATE_FIELDS and not format_spec and not conversion:
+                yield literal, field
+            else:
+                # Keep the placeholder exactly as written
+                placeholder = "{" + field
+                if conversion:
+                    placeholder += "!" + conversion
+                if format_spec:
+                    placeholder += ":" + format_spec
+                yield literal + placeholder + "}", None
+    
+    def _values(self, number, name, date):
+        """Values for the placeholders this template uses"""
+        values = {}
+        if "number" in self.fields:
+            values["number"] = number or ""
+        if "name" in self.fields:
+            values["name"] = name or ""
+        if "date" in self.fields:
+            values["date"] = date or datetime.now().strftime(DATE_FORMAT)
+        return values
+    
+    def render(self, number="", name="", date=None):
+        """Return the message text for one chat"""
+        if not self.fields:
+            return self.text
+        values = self._values(number, name, date)
+        return "".join(part if isinstance(part, str) else values[part[0]]
+                       for part in self.parts)
+    
+    def render_encoded(self, number="", name="", date=None):
+        """Return the URL-encoded message for one chat; static text is pre-encoded"""
+        if self.encoded_text is not None:
+            return self.encoded_text
+        values = self._values(number, name, date)
+        return "".join(part if isinstance(part, str) else quote(values[part[0]])
+                       for part in self.encoded_parts)
+
+@functools.lru_cache(maxsize=32)
+def compile_template(text):
+    """Return the compiled template for text, reusing earlier compilations"""
+    return MessageTemplate(text)
+
+def whatsapp_url(phone_number, message=None, name=""):
+    """Build a wa.me chat link, with the message pre-filled when one is given"""
+    # Remove + from phone number for URL
+    clean_number = phone_number.replace('+', '')
+    if message is None:
+        return f"https://wa.me/{clean_number}"
+    encoded_message = compile_template(message).render_encoded(number=phone_number, name=name)
+    return f"https://wa.me/{clean_number}?text={encoded_message}"
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Runtime metrics for Smart Clipboard WhatsApp Sender
+Counters and latency histograms, readable as Prometheus text or JSON from an
+optional localhost HTTP endpoint
+"""
+
+import bisect
+import json
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Latency bucket upper bounds in seconds (from sub-millisecond detection up
+# to rate-limited opens that wait for a minute)
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+class Counter:
+    """Monotonically increasing count"""
+    
+    metric_type = "counter"
+    
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self.value = 0
+        self._lock = threading.Lock()
+    
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+    
+    def samples(self):
+        """[(suffix, labels, value)] for exposition"""
+        return [("", "", self.value)]
+    
+    def to_dict(self):
+        return self.value
+
+class Histogram:
+    """Distribution of observed values over fixed buckets"""
+    
+    metric_type = "histogram"
+    
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+    
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+    
+    def samples(self):
+        """[(suffix, labels, value)] with cumulative bucket counts"""
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        samples = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            samples.append(("_bucket", f'{{le="{bound:g}"}}', cumulative))
+        samples.append(("_bucket", '{le="+Inf"}', count))
+        samples.append(("_sum", "", total))
+        samples.append(("_count", "", count))
+        return samples
+    
+    def to_dict(self):
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        return {
+            "count": count,
+            "sum": total,
+            "buckets": {f"{bound:g}": bucket_count for bound, bucket_count in zip(self.buckets, counts)},
+            "overflow": counts[-1],
+        }
+
+class MetricsRegistry:
+    """Named collection of counters and histograms"""
+    
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+    
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+    
+    def counter(self, name, help_text):
+        return self._register(Counter(name, help_text))
+    
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help_text, buckets))
+    
+    def render_prometheus(self):
+        """Prometheus text exposition format"""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.metric_type}")
+            for suffix, labels, value in metric.samples():
+                # repr keeps full float precision (large _sum values included)
+                lines.append(f"{metric.name}{suffix}{labels} {value!r}")
+        return "\n".join(lines) + "\n"
+    
+    def to_dict(self):
+        return {name: metric.to_dict() for name, metric in list(self._metrics.items())}
+    
+    def dump_json(self, path):
+        """Write all metrics to path as JSON"""
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+class AppMetrics:
+    """The metrics recorded by the clipboard monitor and opener"""
+    
+    def __init__(self, registry=None):
+        self.registry = registry or MetricsRegistry()
+        registry = self.registry
+        self.polls = registry.counter("clipboard_polls_total", "Clipboard reads by the monitor")
+        self.poll_errors = registry.counter("clipboard_poll_errors_total", "Failed clipboard reads")
+        self.poll_seconds = registry.histogram(
+            "clipboard_poll_seconds", "Time to read and check the clipboard once")
+        self.detect_seconds = registry.histogram(
+            "phone_detect_seconds", "Time to detect and normalize a number in clipboard text")
+        self.detections = registry.counter("phone_detections_total", "Clipboard changes containing a number")
+        self.duplicates = registry.counter("phone_duplicates_total", "Detected numbers skipped as duplicates")
+        self.dropped = registry.counter("dispatch_dropped_total", "Detected numbers dropped by a full open queue")
+        self.opens = registry.counter("whatsapp_opens_total", "Chats opened (or URLs generated)")
+        self.open_failures = registry.counter("whatsapp_open_failures_total", "Chats that failed to open")
+        self.open_seconds = registry.histogram(
+            "whatsapp_open_seconds", "Time to launch the app or browser, including rate limit waits")
+        self.copy_to_open_seconds = registry.histogram(
+            "copy_to_open_seconds", "Time from noticing a copied number to its chat being opened")
+
+class MetricsServer:
+    """Serves /metrics (Prometheus text) and /metrics.json on localhost"""
+    
+    def __init__(self, registry, port, host="127.0.0.1"):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server = None
+    
+    def start(self):
+        """Start serving in a background thread (no-op if already running)"""
+        if self._server is not None:
+            return
+        # Only imported when the endpoint is enabled, to keep startup fast
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        registry = self.registry
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body = registry.render_prometheus().encode("utf-8")
+                    content_type = "text/plain; version=0.0.4; charset=utf-8"
+                elif self.path == "/metrics.json":
+                    body = json.dumps(registry.to_dict()).encode("utf-8")
+                    content_type = "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                # Scrapes are not worth a log line each
+                pass
+        
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name="metrics-server", daemon=True).start()
+        logger.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+    
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Opener backends for Smart Clipboard WhatsApp Sender
+Hand wa.me and whatsapp:// links to the browser or the desktop app
+"""
+
+import logging
+import os
+import queue
+import subprocess
+import sys
+import threading
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+OPENER_BACKENDS = ("auto", "web", "system", "helper", "fake")
+
+# Command line flag that turns a frozen executable into the helper process
+HELPER_FLAG = "--opener-helper"
+
+# Seconds to wait for the helper to exit when closing
+HELPER_CLOSE_TIMEOUT = 2.0
+
+# Seconds to wait for the helper to answer a link before restarting it
+HELPER_REPLY_TIMEOUT = 30.0
+
+class Opener:
+    """Base class for opener backends"""
+    
+    name = "base"
+    
+    def open(self, url):
+        """Open url; returns False when no handler could open it"""
+        raise NotImplementedError
+    
+    def close(self):
+        """Release backend resources"""
+
+class WebBrowserOpener(Opener):
+    """Opens links in the default browser with the webbrowser module"""
+    
+    name = "web"
+    
+    def open(self, url):
+        import webbrowser
+        return webbrowser.open(url)
+
+class SystemOpener(Opener):
+    """Opens links with the desktop's URL handler (whatsapp:// goes to the app)
+    
+    Windows uses ShellExecute through os.startfile, so no shell is started;
+    macOS uses open and Linux xdg-open.
+    """
+    
+    name = "system"
+    
+    def open(self, url):
+        if os.name == 'nt':
+            try:
+                os.startfile(url)
+            except OSError:
+                # No application is registered for the scheme
+                return False
+            return True
+        
+        command = ["open" if sys.platform == "darwin" else "xdg-open", url]
+        try:
+            result = subprocess.run(command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                    stderr=subprocess.DEVNULL)
+        except OSError:
+            return False
+        return result.returncode == 0
+
+class HelperProcessOpener(Opener):
+    """Sends links to one long-lived helper process over a pipe
+    
+    The helper is started on the first open and restarted if it exits, so
+    each chat costs a line on a pipe instead of a new process from this one.
+    The helper answers every link with "ok" or "error"; a helper that does
+    not answer within reply_timeout is killed and started again on the next
+    link.
+    """
+    
+    name = "helper"
+    
+    def __init__(self, command=None, reply_timeout=HELPER_REPLY_TIMEOUT):
+        self.command = command or helper_command()
+        self.reply_timeout = reply_timeout
+        self.started = 0
+        self._process = None
+        self._replies = None
+        self._lock = threading.Lock()
+    
+    def _start(self):
+        self._process = subprocess.Popen(
+            self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            universal_newlines=True, encoding="utf-8", bufsize=1,
+            creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0),
+        )
+        self.started += 1
+        # Replies are read on a thread so waiting for one can time out
+        self._replies = queue.Queue()
+        threading.Thread(target=self._read_replies, args=(self._process.stdout, self._replies),
+                         name="opener-helper-replies", daemon=True).start()
+        logger.info(f"Started opener helper (pid {self._process.pid})")
+    
+    @staticmethod
+    def _read_replies(stdout, replies):
+        """Queue each reply line, then "" once the helper has exited"""
+        try:
+            for line in stdout:
+                if line.strip():
+                    replies.put(line.strip())
+        except (OSError, ValueError):
+            pass
+        replies.put("")
+    
+    def _send(self, url):
+        """Send one link; returns the reply, "" if the helper is gone, or None on timeout"""
+        try:
+            self._process.stdin.write(url + "\n")
+            self._process.stdin.flush()
+        except (OSError, ValueError):
+            return ""
+        try:
+            return self._replies.get(timeout=self.reply_timeout)
+        except queue.Empty:
+            logger.warning(f"Opener helper did not answer within {self.reply_timeout}s, restarting it")
+            self._process.kill()
+            return None
+    
+    def open(self, url):
+        if "\n" in url or "\r" in url:
+            raise ValueError("Links sent to the opener helper must be a single line")
+        with self._lock:
+            # A helper that died since the last link is replaced once
+            for _ in range(2):
+                if self._process is None or self._process.poll() is not None:
+                    self._start()
+                reply = self._send(url)
+                if reply is None:
+                    # The link may still open, so it is not sent again
+                    self._terminate()
+                    return False
+                if reply:
+                    return reply == "ok"
+                self._terminate()
+            return False
+    
+    def _terminate(self):
+        process, self._process = self._process, None
+        if process is None:
+            return
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+        try:
+            process.wait(HELPER_CLOSE_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+    
+    def close(self):
+        with self._lock:
+            self._terminate()
+
+class RecordingOpener(Opener):
+    """Records links instead of opening them, for tests and dry runs"""
+    
+    name = "fake"
+    
+    def __init__(self, result=True):
+        self.result = result
+        self.urls = []
+    
+    def open(self, url):
+        self.urls.append(url)
+        return self.result
+
+def open_url(url):
+    """Open url in this process: web links in the browser, others with the system handler"""
+    if urlsplit(url).scheme in ("http", "https"):
+        return WebBrowserOpener().open(url)
+    return SystemOpener().open(url)
+
+def helper_command():
+    """Command line that starts the helper from source or a frozen build"""
+    if getattr(sys, "frozen", False):
+        return [sys.executable, HELPER_FLAG]
+    return [sys.executable, os.path.abspath(__file__)]
+
+def detach_stdout():
+    """Point fd 1 at os.devnull and return a stream writing to the original stdout
+    
+    Browsers started by the helper inherit fd 1, and anything they print there
+    would otherwise be read as a reply.
+    """
+    sys.stdout.flush()
+    reply_fd = os.dup(1)  # Not inherited by child processes
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.close(devnull)
+    return os.fdopen(reply_fd, "w", encoding="utf-8")
+
+def serve_helper(stdin=None, stdout=None):
+    """Helper process loop: open one link per input line until stdin closes"""
+    stdin = stdin or sys.stdin
+    stdout = stdout or detach_stdout()
+    for line in stdin:
+        url = line.strip()
+        if not url:
+            continue
+        try:
+            ok = open_url(url)
+        except Exception:
+            ok = False
+        stdout.write("ok\n" if ok else "error\n")
+        stdout.flush()
+    return 0
+
+def create_openers(backend="auto"):
+    """Return (app_opener, web_opener) for whatsapp:// and wa.me links
+    
+    auto opens wa.me links with the webbrowser module and whatsapp:// links
+    with the system handler; the other backends handle both kinds. An
+    unknown backend is logged and treated as auto.
+    """
+    if backend not in OPENER_BACKENDS:
+        logger.warning(f"Unknown opener_backend {backend!r}, using auto")
+        backend = "auto"
+    if backend == "auto":
+        return SystemOpener(), WebBrowserOpener()
+    opener = {
+        "web": WebBrowserOpener,
+        "system": SystemOpener,
+        "helper": HelperProcessOpener,
+        "fake": RecordingOpener,
+    }[backend]()
+    return opener, opener
+
+if __name__ == "__main__":
+    sys.exit(serve_helper())
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Phone number detection engine for Smart Clipboard WhatsApp Sender
+Compiles all supported phone formats into a single pattern so that detection,
+"numbers only" checking and normalization happen in one scan of the text
+"""
+
+import codecs
+import re
+import threading
+from collections import OrderedDict, namedtuple
+
+from phone_normalizer import PhoneNormalizer
+
+# Phone number regex patterns for global formats, in priority order.
+# Each pattern gets a named group in the combined expression so a match
+# also tells us which format was recognised.
+PHONE_PATTERNS = [
+    ("international_separated", r'\+\d{1,3}[-.\s]?\d{1,4}[-.\s]?\d{1,4}[-.\s]?\d{1,4}[-.\s]?\d{1,4}'),  # International with various separators
+    ("international", r'\+\d{1,3}\s?\d{6,14}'),  # International format with +
+    ("digits", r'\d{10,15}'),                    # Simple 10-15 digit numbers
+    ("us_parentheses", r'\(\d{3}\)\s?\d{3}[-.\s]?\d{4}'),  # US format (xxx) xxx-xxxx
+    ("us_separated", r'\d{3}[-.\s]\d{3}[-.\s]\d{4}'),  # US format xxx-xxx-xxxx or xxx.xxx.xxxx
+    ("us_spaces", r'\d{3}\s\d{3}\s\d{4}'),       # US format with spaces
+]
+
+# Longest text any supported format can match. Streaming scans keep this many
+# characters (plus one) from the end of every chunk so that a number split
+# across two chunks is still matched exactly as it would be in one string.
+MAX_MATCH_LENGTH = 32
+
+# Default chunk size for streaming scans (characters)
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Characters that make clipboard text more than "just a phone number"
+WORD_OR_PLUS = re.compile(r'[\w+]')
+
+# Nothing but separators up to the end of the text
+TRAILING_SEPARATORS = re.compile(r'[-.\s]*\Z')
+
+# Texts longer than this are only cached when the caller supplies a short key
+# (such as a clipboard fingerprint), so the cache never pins large strings
+CACHE_KEY_MAX_CHARS = 1024
+
+# Size of the per-detector cache of normalized raw matches
+NORMALIZE_CACHE_SIZE = 4096
+
+PhoneMatch = namedtuple("PhoneMatch", "number raw format start end is_only")
+
+_MISSING = object()
+
+def reaches_end(text, end):
+    """True when only separators follow position end of text
+    
+    In text cut from a longer text, a match that reaches the end may be the
+    first digits of a longer number.
+    """
+    return TRAILING_SEPARATORS.match(text, end) is not None
+
+def iter_text_chunks(source, chunk_size=STREAM_CHUNK_SIZE):
+    """Yield text chunks of at most chunk_size characters from str, bytes or a file"""
+    if isinstance(source, str):
+        for start in range(0, len(source), chunk_size):
+            yield source[start:start + chunk_size]
+        return
+    
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = memoryview(source)
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        for start in range(0, len(source), chunk_size):
+            text = decoder.decode(source[start:start + chunk_size])
+            if text:
+                yield text
+        text = decoder.decode(b'', final=True)
+        if text:
+            yield text
+        return
+    
+    # File-like object opened in text or binary mode
+    decoder = None
+    while True:
+        data = source.read(chunk_size)
+        if not data:
+            break
+        if isinstance(data, str):
+            yield data
+            continue
+        if decoder is None:
+            decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        text = decoder.decode(data)
+        if text:
+            yield text
+    
+    if decoder is not None:
+        text = decoder.decode(b'', final=True)
+        if text:
+            yield text
+
+class LRUCache:
+    """Bounded mapping that forgets the least recently used entries"""
+    
+    def __init__(self, maxsize=256):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key, default=None):
+        """Return the cached value for key (counting a hit or a miss)"""
+        with self._lock:
+            value = self._entries.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def put(self, key, value):
+        """Cache value, evicting the least recently used entry when full"""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        """Forget all entries and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+    
+    def stats(self):
+        """Hit and miss counters and current size"""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "size": len(self._entries), "maxsize": self.maxsize}
+    
+    def __len__(self):
+        return len(self._entries)
+
+class PhoneNumberDetector:
+    """Single-pass phone number detector built from a list of formats"""
+    
+    def __init__(self, patterns=None, normalizer=None, cache_size=256):
+        if patterns is None:
+            patterns = PHONE_PATTERNS
+        self.normalizer = normalizer or PhoneNormalizer()
+        
+        # Repeat copies of the same text cost a dictionary lookup
+        self.cache = LRUCache(cache_size) if cache_size else None
+        self.normalize_cache = LRUCache(NORMALIZE_CACHE_SIZE) if cache_size else None
+        self.formats = [name for name, _ in patterns]
+        self.patterns = [pattern for _, pattern in patterns]
+        
+        # Alternation keeps the priority order of the formats at each position
+        combined = '|'.join(
+            f'(?P<{name}>{pattern})' for name, pattern in patterns
+        )
+        self.regex = re.compile(combined)
+    
+    def detect(self, text, key=None):
+        """Find the first phone number in text, or None if there is none
+        
+        key identifies text in the cache (the text itself when omitted).
+        """
+        if self.cache is None or (key is None and len(text) > CACHE_KEY_MAX_CHARS):
+            return self._detect(text)
+        
+        if key is None:
+            key = text
+        detection = self.cache.get(key, _MISSING)
+        if detection is _MISSING:
+            detection = self._detect(text)
+            self.cache.put(key, detection)
+        return detection
+    
+    def _detect(self, text):
+        """Uncached detect"""
+        match = self.regex.search(text)
+        if not match:
+            return None
+        
+        start, end = match.span()
+        
+        # The text is "only a number" when nothing but separators and
+        # whitespace surrounds the match
+        is_only = (WORD_OR_PLUS.search(text, 0, start) is None
+                   and WORD_OR_PLUS.search(text, end) is None)
+        
+        return self._build_match(match, 0, is_only)
+    
+    def _build_match(self, match, offset, is_only):
+        """Turn a regex match into a PhoneMatch at offset in the scanned text"""
+        raw = match.group()
+        return PhoneMatch(
+            number=self.normalize(raw),
+            raw=raw,
+            format=match.lastgroup,
+            start=offset + match.start(),
+            end=offset + match.end(),
+            is_only=is_only,
+        )
+    
+    def normalize(self, raw):
+        """Normalize a matched number, reusing earlier results for the same text"""
+        if self.normalize_cache is None:
+            return self.normalizer.normalize(raw)
+        number = self.normalize_cache.get(raw, _MISSING)
+        if number is _MISSING:
+            number = self.normalizer.normalize(raw)
+            self.normalize_cache.put(raw, number)
+        return number
+    
+    def cache_stats(self):
+        """Hit/miss counters of the detection and normalization caches"""
+        if self.cache is None:
+            return {}
+        return {"detection": self.cache.stats(), "normalization": self.normalize_cache.stats()}
+    
+    def contains_phone_number(self, text):
+        """Check if text contains a phone number"""
+        return self.regex.search(text) is not None
+    
+    def is_phone_number_only(self, text):
+        """Check if text contains ONLY a phone number (no extra text)"""
+        detection = self.detect(text)
+        return detection is not None and detection.is_only
+    
+    def extract_phone_number(self, text):
+        """Extract and normalize the first phone number in text"""
+        detection = self.detect(text)
+        return detection.number if detection else None
+    
+    def detect_all(self, text, truncated=False):
+        """Find every phone number in text in one scan
+        
+        Returns (numbers, is_only): the distinct normalized numbers in order
+        of first appearance, and whether the text holds nothing but numbers,
+        separators and whitespace (such as a copied column of numbers).
+        truncated=True means text was cut from a longer text, so a number
+        reaching its end is left out.
+        """
+        numbers = {}
+        is_only = True
+        position = 0
+        last = None  # Number first seen in the latest match
+        for match in self.iter_matches(text):
+            if is_only and WORD_OR_PLUS.search(text, position, match.start) is not None:
+                is_only = False
+            position = match.end
+            last = match.number if match.number not in numbers else None
+            if match.number:
+                numbers[match.number] = None
+        if truncated and last and reaches_end(text, position):
+            del numbers[last]
+        if is_only and WORD_OR_PLUS.search(text, position) is not None:
+            is_only = False
+        return list(numbers), is_only
+    
+    def iter_matches(self, source, chunk_size=STREAM_CHUNK_SIZE):
+        """Lazily yield every phone number match in a str, bytes or file-like source"""
+        if chunk_size <= MAX_MATCH_LENGTH:
+            raise ValueError(f"chunk_size must be larger than {MAX_MATCH_LENGTH}")
+        
+        if isinstance(source, str) and len(source) <= chunk_size:
+            # Short text (such as one line of a list) needs no chunking
+            for match in self.regex.finditer(source):
+                yield self._build_match(match, 0, False)
+            return
+        
+        overlap = MAX_MATCH_LENGTH + 1
+        finditer = self.regex.finditer
+        carry = ''
+        offset = 0  # Position of carry[0] in the whole stream
+        
+        for chunk in iter_text_chunks(source, chunk_size):
+            buffer = carry + chunk if carry else chunk
+            
+            # Matches starting before this point have seen all the text they
+            # could possibly consume, so they are final
+            safe = len(buffer) - overlap
+            position = 0
+            
+            for match in finditer(buffer):
+                if match.start() >= safe:
+                    break
+                
+                yield self._build_match(match, offset, False)
+                position = match.end()
+            
+            keep_from = max(position, safe, 0)
+            carry = buffer[keep_from:]
+            offset += keep_from
+        
+        # Whatever is left is the end of the stream
+        for match in self.regex.finditer(carry):
+            yield self._build_match(match, offset, False)
+    
+    def iter_phone_numbers(self, source, chunk_size=STREAM_CHUNK_SIZE):
+        """Lazily yield every normalized phone number in a str, bytes or file-like source"""
+        for match in self.iter_matches(source, chunk_size):
+            if match.number:
+                yield match.number
+
+_default_detector = None
+
+def get_default_detector():
+    """Return the shared detector built from the default formats"""
+    global _default_detector
+    if _default_detector is None:
+        _default_detector = PhoneNumberDetector()
+    return _default_detector
+
+def iter_phone_numbers(source, chunk_size=STREAM_CHUNK_SIZE):
+    """Lazily yield every normalized phone number in a str, bytes or file-like source"""
+    return get_default_detector().iter_phone_numbers(source, chunk_size)
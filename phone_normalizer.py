@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+E.164 phone number normalizer for Smart Clipboard WhatsApp Sender
+Country calling codes are looked up in a prefix trie built from a compact
+table, and national number lengths decide how a number without + is read
+"""
+
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# Country calling codes: "code regions trunk_prefix national_lengths"
+# Lengths are the national significant number (without trunk prefix), either
+# single values or ranges. "-" means the country has no trunk prefix.
+COUNTRY_TABLE = """
+1 US,CA,PR,DO,JM,TT,BS,BB 1 10
+7 RU,KZ 8 10
+20 EG 0 8-10
+27 ZA 0 9
+30 GR - 10
+31 NL 0 9
+32 BE 0 8-9
+33 FR 0 9
+34 ES - 9
+36 HU 06 8-9
+39 IT - 6-11
+40 RO 0 9
+41 CH 0 9
+43 AT 0 4-13
+44 GB 0 9-10
+45 DK - 8
+46 SE 0 7-10
+47 NO - 8
+48 PL - 9
+49 DE 0 6-13
+51 PE 0 8-9
+52 MX - 10
+53 CU 0 6-8
+54 AR 0 10
+55 BR 0 10-11
+56 CL - 9
+57 CO - 10
+58 VE 0 10
+60 MY 0 8-10
+61 AU 0 9
+62 ID 0 8-12
+63 PH 0 10
+64 NZ 0 8-10
+65 SG - 8
+66 TH 0 8-9
+81 JP 0 9-10
+82 KR 0 8-10
+84 VN 0 9-10
+86 CN 0 10-11
+90 TR 0 10
+91 IN 0 10
+92 PK 0 9-10
+93 AF 0 9
+94 LK 0 9
+95 MM 0 8-10
+98 IR 0 10
+211 SS 0 9
+212 MA 0 9
+213 DZ 0 8-9
+216 TN - 8
+218 LY 0 9
+220 GM - 7
+221 SN - 9
+233 GH 0 9
+234 NG 0 8-10
+249 SD 0 9
+251 ET 0 9
+254 KE 0 9-10
+255 TZ 0 9
+256 UG 0 9
+260 ZM 0 9
+263 ZW 0 9
+351 PT - 9
+352 LU - 4-11
+353 IE 0 7-9
+358 FI 0 5-12
+380 UA 0 9
+420 CZ - 9
+852 HK - 8
+853 MO - 8
+880 BD 0 10
+886 TW 0 8-9
+960 MV - 7
+961 LB 0 7-8
+962 JO 0 8-9
+963 SY 0 9
+964 IQ 0 10
+965 KW - 8
+966 SA 0 9
+967 YE 0 9
+968 OM - 8
+970 PS 0 9
+971 AE 0 8-9
+972 IL 0 8-9
+973 BH - 8
+974 QA - 8
+977 NP 0 8-10
+"""
+
+# International call prefix accepted in front of a country code
+INTERNATIONAL_PREFIX = "00"
+
+NON_DIGIT = re.compile(r'\D')
+
+class CountryCode:
+    """One row of COUNTRY_TABLE"""
+    
+    __slots__ = ("code", "regions", "trunk_prefix", "lengths")
+    
+    def __init__(self, code, regions, trunk_prefix, lengths):
+        self.code = code
+        self.regions = regions
+        self.trunk_prefix = trunk_prefix
+        self.lengths = lengths
+    
+    def is_valid_length(self, national):
+        """Check a national significant number length"""
+        return len(national) in self.lengths
+
+def parse_lengths(spec):
+    """Turn "9" or "8-10" into a frozenset of lengths"""
+    if "-" in spec:
+        low, high = spec.split("-")
+        return frozenset(range(int(low), int(high) + 1))
+    return frozenset([int(spec)])
+
+def parse_country_table(table):
+    """Parse the compact table into CountryCode rows"""
+    countries = []
+    for line in table.strip().splitlines():
+        code, regions, trunk, lengths = line.split()
+        countries.append(CountryCode(
+            code, tuple(regions.split(",")), "" if trunk == "-" else trunk, parse_lengths(lengths)
+        ))
+    return countries
+
+class CountryCodeTrie:
+    """Prefix trie over country calling codes (digit -> child node)"""
+    
+    # Key under which a node stores the CountryCode that ends there
+    TERMINAL = ""
+    
+    def __init__(self, countries):
+        self.root = {}
+        for country in countries:
+            node = self.root
+            for digit in country.code:
+                node = node.setdefault(digit, {})
+            node[self.TERMINAL] = country
+    
+    def match(self, digits):
+        """Return the CountryCode that digits start with, or None
+        
+        Calling codes are prefix-free, so the first code found is the only one.
+        """
+        node = self.root
+        for digit in digits[:3]:
+            node = node.get(digit)
+            if node is None:
+                return None
+            country = node.get(self.TERMINAL)
+            if country is not None:
+                return country
+        return None
+
+_countries = parse_country_table(COUNTRY_TABLE)
+_trie = CountryCodeTrie(_countries)
+_regions = {region: country for country in _countries for region in country.regions}
+
+def get_country_for_region(region):
+    """Return the CountryCode for a two-letter region such as "AE", or None"""
+    return _regions.get(region.upper()) if region else None
+
+class PhoneNormalizer:
+    """Converts matched phone numbers to E.164 (+ and up to 15 digits)
+    
+    Numbers written with + (or the 00 international prefix) keep their
+    country code. Other numbers are read as national numbers of the default
+    region when their length fits, otherwise as international numbers whose
+    country code is recognised by the trie.
+    """
+    
+    def __init__(self, default_region="US"):
+        self.default_region = default_region
+        self.default_country = get_country_for_region(default_region)
+        if default_region and self.default_country is None:
+            raise ValueError(f"Unknown default region: {default_region}")
+    
+    @classmethod
+    def from_config(cls, config):
+        """Build a normalizer from the default_region setting in config
+        
+        An unknown region (such as "UK" instead of "GB") is logged and
+        replaced by US rather than stopping the app.
+        """
+        region = config.get("default_region", "US")
+        if region and get_country_for_region(region) is None:
+            logger.warning(f"Unknown default_region {region!r}, using US")
+            region = "US"
+        return cls(region)
+    
+    def _international(self, digits):
+        """E.164 for digits that start with a known country code and fit its lengths"""
+        country = _trie.match(digits)
+        if country is not None and country.is_valid_length(digits[len(country.code):]):
+            return '+' + digits
+        return None
+    
+    def _national(self, digits):
+        """E.164 for a national number of the default region, with or without trunk prefix"""
+        country = self.default_country
+        if country is None:
+            return None
+        
+        trunk = country.trunk_prefix
+        if trunk and digits.startswith(trunk) and country.is_valid_length(digits[len(trunk):]):
+            return '+' + country.code + digits[len(trunk):]
+        if country.is_valid_length(digits):
+            return '+' + country.code + digits
+        return None
+    
+    def normalize(self, number):
+        """Return number in E.164 form, or None if it has no digits"""
+        has_plus = number.lstrip().startswith('+')
+        digits = NON_DIGIT.sub('', number)
+        if not digits:
+            return None
+        
+        if has_plus:
+            # Already has a country code
+            return '+' + digits
+        
+        if digits.startswith(INTERNATIONAL_PREFIX):
+            international = self._international(digits[len(INTERNATIONAL_PREFIX):])
+            if international:
+                return international
+        
+        normalized = self._national(digits) or self._international(digits)
+        if normalized:
+            return normalized
+        
+        # Unknown layout: long numbers are most likely international
+        # (country codes never start with 0)
+        if len(digits) >= 10 and digits[0] != '0':
+            return '+' + digits
+        return digits
@@ -4,13 +4,61 @@ Test script for Smart Clipboard WhatsApp Sender
 Tests phone number detection and URL generation
 """
 
+import atexit
+import ctypes
+import gzip
+import io
+import json
+import logging
+import logging.handlers
 import sys
 import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from urllib.parse import quote
+from urllib.request import urlopen
 
 # Add the main directory to the path
-sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, REPO_DIR)
 
-from main import ClipboardWhatsAppSender
+from main import GUI_LOG_BATCH_SIZE, ClipboardWhatsAppSender
+from app_logging import create_file_handler
+from campaign import CampaignRunner
+from clipboard_watchers import (
+    AdaptivePollScheduler, FakeClipboardWatcher, PollingClipboardWatcher, WatcherUnavailable,
+    X11ClipboardReader, X11Error, XErrorEvent, check_x11_errors, clipboard_fingerprint,
+    create_clipboard_reader, pyperclip_paste
+)
+import clipboard_watchers
+from config_manager import ConfigManager, MonitorSettings
+from dedup_store import DuplicateStore, PersistentDuplicateIndex
+from dispatch import DispatchQueue, DispatchRequest, TokenBucket
+from link_export import export_links
+from message_templates import compile_template
+from metrics import MetricsRegistry, MetricsServer
+from openers import HelperProcessOpener, RecordingOpener, create_openers
+from phone_detector import PhoneNumberDetector
+from phone_normalizer import PhoneNormalizer
+
+def report_checks(checks):
+    """Print PASS/FAIL for each (description, ok) check and fail the test if any failed"""
+    failures = [description for description, ok in checks if not ok]
+    for description, ok in checks:
+        print(f"  {'✅ PASS' if ok else '❌ FAIL'} {description}")
+    assert not failures, f"Failed checks: {', '.join(failures)}"
+
+def run_test(test):
+    """Run one test for the script summary; returns False if it failed"""
+    try:
+        test()
+    except AssertionError as error:
+        print(f"  ❌ {error}")
+        return False
+    return True
 
 def test_phone_detection():
     """Test phone number detection functionality"""
@@ -68,7 +116,924 @@ def test_phone_detection():
         print()
     
     print(f"📊 Results: {passed} passed, {failed} failed")
-    return failed == 0
+    assert failed == 0, f"{failed} failed"
+
+def test_single_pass_detection():
+    """Test that one detection pass agrees with the individual checks"""
+    app = ClipboardWhatsAppSender()
+    
+    print("🔍 Testing Single-Pass Detection")
+    print("=" * 35)
+    
+    test_inputs = [
+        "+1 234 567 8900",
+        "(234) 567-8900",
+        "Call me at +1234567890",
+        "\n+971501234567\n",
+        "abc123def",
+        "",
+    ]
+    
+    passed = 0
+    failed = 0
+    
+    for test_input in test_inputs:
+        detection = app.detector.detect(test_input)
+        expected = (
+            app.is_valid_phone_number(test_input),
+            app.is_phone_number_only(test_input),
+            app.extract_phone_number(test_input),
+        )
+        result = (
+            detection is not None,
+            bool(detection and detection.is_only),
+            detection.number if detection else None,
+        )
+        
+        if result == expected:
+            passed += 1
+            print(f"  ✅ PASS '{test_input.strip()}' -> {result}")
+        else:
+            failed += 1
+            print(f"  ❌ FAIL '{test_input.strip()}' -> {result} (expected {expected})")
+    
+    print(f"📊 Results: {passed} passed, {failed} failed")
+    assert failed == 0, f"{failed} failed"
+
+def test_detection_cache():
+    """Test that repeat detections are served from the bounded cache"""
+    print("🧠 Testing Detection Cache")
+    print("=" * 27)
+    
+    detector = PhoneNumberDetector(cache_size=2)
+    checks = []
+    
+    first = detector.detect("Call (234) 567-8900")
+    again = detector.detect("Call (234) 567-8900")
+    stats = detector.cache.stats()
+    checks.append(("repeat copy is a hit", again is first and (stats["hits"], stats["misses"]) == (1, 1)))
+    
+    detector.detect("no number")
+    detector.detect("+971501234567")
+    detector.detect("Call (234) 567-8900")
+    checks.append(("least recently used evicted", detector.cache.stats()["misses"] == 4
+                   and len(detector.cache) == 2))
+    
+    detector.detect("x" * 5000 + " +971501234567")
+    checks.append(("long text not cached without key", len(detector.cache) == 2
+                   and detector.cache.stats()["misses"] == 4))
+    
+    detector.detect("+44 20 7946 0958", key=("fingerprint", 16))
+    checks.append(("explicit key used", detector.detect("ignored", key=("fingerprint", 16)).number
+                   == "+442079460958"))
+    
+    uncached = PhoneNumberDetector(cache_size=0)
+    checks.append(("cache can be disabled", uncached.cache is None
+                   and uncached.extract_phone_number("(234) 567-8900") == "+12345678900"))
+    
+    report_checks(checks)
+
+def test_streaming_extraction():
+    """Test extracting every number from a large input in small chunks"""
+    app = ClipboardWhatsAppSender()
+    
+    print("📜 Testing Streaming Extraction")
+    print("=" * 35)
+    
+    rows = ["+971 50 123 4567", "(234) 567-8900", "note without number", "447946095800"]
+    text = "\n".join(rows * 1000)
+    expected = [app.extract_phone_number(row) for row in rows if app.is_valid_phone_number(row)] * 1000
+    
+    passed = 0
+    failed = 0
+    
+    # Small chunk sizes force numbers to be split across chunk boundaries
+    sources = [
+        ("str", text, 40),
+        ("bytes", text.encode("utf-8"), 41),
+        ("text file", io.StringIO(text), 57),
+        ("binary file", io.BytesIO(text.encode("utf-8")), 1000),
+    ]
+    
+    for description, source, chunk_size in sources:
+        result = list(app.detector.iter_phone_numbers(source, chunk_size))
+        if result == expected:
+            passed += 1
+            print(f"  ✅ PASS {description}: {len(result)} numbers")
+        else:
+            failed += 1
+            print(f"  ❌ FAIL {description}: {len(result)} numbers (expected {len(expected)})")
+    
+    print(f"📊 Results: {passed} passed, {failed} failed")
+    assert failed == 0, f"{failed} failed"
+
+def test_normalizer():
+    """Test E.164 normalization with country code lookup and default region"""
+    print("🌍 Testing E.164 Normalizer")
+    print("=" * 28)
+    
+    us = PhoneNormalizer("US")
+    ae = PhoneNormalizer("AE")
+    test_cases = [
+        # Normalizer, Input, Expected
+        (us, "(234) 567-8900", "+12345678900"),
+        (us, "1 234 567 8900", "+12345678900"),
+        (us, "+44 20 7946 0958", "+442079460958"),
+        (us, "971501234567", "+971501234567"),
+        (us, "00971 50 123 4567", "+971501234567"),
+        (us, "447946095812", "+447946095812"),
+        (ae, "050 123 4567", "+971501234567"),
+        (ae, "50 123 4567", "+971501234567"),
+    ]
+    
+    passed = 0
+    failed = 0
+    for normalizer, test_input, expected in test_cases:
+        result = normalizer.normalize(test_input)
+        if result == expected:
+            passed += 1
+            print(f"  ✅ PASS [{normalizer.default_region}] '{test_input}' -> {result}")
+        else:
+            failed += 1
+            print(f"  ❌ FAIL [{normalizer.default_region}] '{test_input}' -> {result} (expected {expected})")
+    
+    if PhoneNormalizer.from_config({"default_region": "UK"}).default_region == "US":
+        passed += 1
+        print("  ✅ PASS unknown region falls back to US")
+    else:
+        failed += 1
+        print("  ❌ FAIL unknown region falls back to US")
+    
+    print(f"📊 Results: {passed} passed, {failed} failed")
+    assert failed == 0, f"{failed} failed"
+
+def test_clipboard_watcher():
+    """Test the monitor loop against the in-memory clipboard backend"""
+    print("📋 Testing Clipboard Watcher")
+    print("=" * 30)
+    
+    opened = []
+    app = ClipboardWhatsAppSender()
+    app.config["avoid_duplicates"] = True
+    app.config["numbers_only_mode"] = False
+    app.processed_numbers = DuplicateStore()
+    app.open_whatsapp = lambda number, message=None: opened.append(number)
+    app.clipboard_watcher = FakeClipboardWatcher()
+    try:
+        app.start_monitoring()
+        
+        for text in ["+971501234567", "no number here", "Call (234) 567-8900"]:
+            app.clipboard_watcher.copy(text)
+            time.sleep(0.1)
+        
+        deadline = time.time() + 5
+        while len(set(opened)) < 2 and time.time() < deadline:
+            time.sleep(0.05)
+    finally:
+        # Stop the worker and config watcher threads started with monitoring
+        app.stop_monitoring()
+        app.dispatcher.stop(timeout=1.0)
+        app.config_manager.stop()
+    
+    expected = ["+971501234567", "+12345678900"]
+    unique_opened = list(dict.fromkeys(opened))
+    checks = [(f"opened {unique_opened} (expected {expected})", unique_opened == expected)]
+    
+    class BrokenWatcher(FakeClipboardWatcher):
+        name = "broken"
+        def wait_for_change(self, timeout=None):
+            raise WatcherUnavailable("X connection lost")
+    
+    # A watcher that stops working mid-run is replaced by polling the same reader
+    opened.clear()
+    app.clipboard_watcher = BrokenWatcher("+971501234567")
+    app.config["check_interval"] = 0.05
+    try:
+        app.start_monitoring()
+        deadline = time.time() + 5
+        while not opened and time.time() < deadline:
+            time.sleep(0.05)
+    finally:
+        app.stop_monitoring()
+        app.dispatcher.stop(timeout=1.0)
+        app.config_manager.stop()
+    checks.append(("broken watcher replaced by polling",
+                   app.clipboard_watcher.name == "polling" and opened == ["+971501234567"]))
+    
+    report_checks(checks)
+
+def test_change_detection():
+    """Test clipboard fingerprints and the scan size guard"""
+    print("🔎 Testing Change Detection")
+    print("=" * 27)
+    
+    checks = []
+    fingerprint = clipboard_fingerprint("+971501234567")
+    checks.append(("fingerprint is length and digest", fingerprint[0] == 13 and len(fingerprint[1]) == 16))
+    checks.append(("same text, same fingerprint", clipboard_fingerprint("+971501234567") == fingerprint))
+    checks.append(("same length, new fingerprint", clipboard_fingerprint("+971501234568") != fingerprint))
+    
+    app = ClipboardWhatsAppSender(config_overrides={"numbers_only_mode": False, "avoid_duplicates": False,
+                                                    "max_scan_chars": 96})
+    app.refresh_settings()
+    submitted = []
+    app.dispatcher.submit = lambda number, message, detected_at=None: submitted.append(number) or True
+    checks.append(("unchanged text skipped", app.check_clipboard("+971501234567")
+                   and not app.check_clipboard("+971501234567")))
+    
+    # The scan stops after 96 characters, in the middle of the number
+    submitted.clear()
+    app.check_clipboard("note " * 17 + "+971501234567 and some more text")
+    checks.append(("number cut off by the guard skipped", submitted == []))
+    app.check_clipboard("note " * 16 + "+971501234567 and some more text")
+    checks.append(("number before the cut opened", submitted == ["+971501234567"]))
+    
+    report_checks(checks)
+
+def test_clipboard_reader():
+    """Test the in-process clipboard reader's fallback and cleanup"""
+    print("📖 Testing Clipboard Reader")
+    print("=" * 27)
+    
+    checks = []
+    checks.append(("pyperclip on request", create_clipboard_reader("pyperclip") is pyperclip_paste))
+    
+    # No X server on this display: every read goes to the fallback, and the
+    # connection is only attempted once
+    display = os.environ.get("DISPLAY")
+    os.environ["DISPLAY"] = ":97"
+    try:
+        reader = X11ClipboardReader(fallback=lambda: "+971501234567")
+        texts = [reader(), reader()]
+    finally:
+        if display is None:
+            del os.environ["DISPLAY"]
+        else:
+            os.environ["DISPLAY"] = display
+    checks.append(("falls back when unavailable", texts == ["+971501234567"] * 2
+                   and reader.unavailable and reader.fallbacks == 2))
+    
+    class Reader:
+        closed = False
+        def __call__(self):
+            return ""
+        def close(self):
+            self.closed = True
+    
+    watcher = PollingClipboardWatcher(paste=Reader())
+    watcher.close()
+    checks.append(("watcher closes its reader", watcher.paste.closed))
+    
+    # Xlib calls these instead of exiting; the next check raises for that display only
+    event = XErrorEvent(error_code=3, request_code=20)
+    clipboard_watchers._x11_error_handler(1001, ctypes.byref(event))
+    clipboard_watchers._x11_io_error_handler(1002)
+    errors = []
+    for display in (1001, 1002, 1003):
+        try:
+            check_x11_errors(display)
+        except X11Error as e:
+            errors.append(str(e))
+    checks.append(("X errors recorded, not fatal",
+                   errors == ["X error 3 in request 20", "X connection lost"]))
+    
+    report_checks(checks)
+
+def test_adaptive_polling():
+    """Test that polling backs off while idle and speeds up after a copy"""
+    print("⏱️ Testing Adaptive Polling")
+    print("=" * 30)
+    
+    scheduler = AdaptivePollScheduler(min_interval=0.1, max_interval=2.0, backoff=2.0)
+    intervals = []
+    for _ in range(6):
+        intervals.append(scheduler.next_interval())
+        scheduler.record_activity(False)
+    scheduler.record_activity(True)
+    intervals.append(scheduler.next_interval())
+    
+    expected = [0.1, 0.2, 0.4, 0.8, 1.6, 2.0, 0.1]
+    checks = [(f"intervals {intervals} (expected {expected})", [round(i, 3) for i in intervals] == expected)]
+    
+    scheduler = AdaptivePollScheduler.from_config({"poll_min_interval": 5.0, "poll_max_interval": 1.0})
+    checks.append(("invalid settings fall back", (scheduler.min_interval, scheduler.max_interval,
+                                                  scheduler.backoff) == (0.1, 2.0, 1.5)))
+    scheduler = AdaptivePollScheduler.from_config({"adaptive_polling": False, "check_interval": 0})
+    checks.append(("invalid check interval falls back", scheduler.next_interval() == 1.0))
+    
+    report_checks(checks)
+
+def test_duplicate_store():
+    """Test duplicate suppression cooldown and size limit"""
+    print("🛑 Testing Duplicate Store")
+    print("=" * 30)
+    
+    now = [0.0]
+    store = DuplicateStore(max_entries=3, ttl_seconds=60, clock=lambda: now[0])
+    
+    checks = []
+    checks.append(("first sighting", store.check_and_add("+111") is False))
+    checks.append(("repeat within cooldown", store.check_and_add("+111") is True))
+    now[0] = 61.0
+    checks.append(("repeat after cooldown", store.check_and_add("+111") is False))
+    for number in ("+222", "+333", "+444"):
+        store.add(number)
+    checks.append(("oldest evicted at limit", "+111" not in store and len(store) == 3))
+    store.clear()
+    checks.append(("clear", len(store) == 0))
+    
+    # Numbers recorded on disk are still duplicates after a restart
+    db_path = os.path.join(tempfile.mkdtemp(), "processed_numbers.db")
+    store = DuplicateStore(backing=PersistentDuplicateIndex(db_path))
+    store.add("+971501234567")
+    store.close()
+    store = DuplicateStore(backing=PersistentDuplicateIndex(db_path))
+    checks.append(("remembered after restart", "+971501234567" in store))
+    checks.append(("unknown number after restart", "+442079460958" not in store))
+    store.close()
+    
+    report_checks(checks)
+
+def test_dispatch_queue():
+    """Test that opening chats never blocks detection"""
+    print("📬 Testing Dispatch Queue")
+    print("=" * 30)
+    
+    release = threading.Event()
+    opened = []
+    
+    def slow_open(request):
+        release.wait(5)
+        opened.append(request.number)
+    
+    queue = DispatchQueue(slow_open, maxsize=2, policy="coalesce")
+    queue.start()
+    
+    checks = []
+    started = time.time()
+    results = [queue.submit("+111", "Hello")]
+    while queue.pending() and time.time() - started < 5:
+        time.sleep(0.01)
+    results += [queue.submit(number, "Hello") for number in ("+222", "+222", "+333", "+444")]
+    checks.append(("submit does not wait for opener", time.time() - started < 0.5))
+    # +111 is being opened, +222 coalesced, +333 fills the queue, +444 dropped
+    checks.append(("coalesce and drop when full", results == [True, True, True, True, False]))
+    
+    release.set()
+    queue.join(timeout=5)
+    queue.stop(timeout=5)
+    checks.append(("each number opened once", opened == ["+111", "+222", "+333"]))
+    
+    queue = DispatchQueue.from_config(slow_open, {"dispatch_policy": "drop", "dispatch_queue_size": 0})
+    checks.append(("unknown policy falls back", queue.policy == "coalesce" and queue.maxsize == 64))
+    
+    # Edits to config.json reach the running queue
+    app = ClipboardWhatsAppSender()
+    dispatcher = app.dispatcher
+    app.config.update(dispatch_policy="drop_oldest", dispatch_queue_size=8)
+    app.apply_config_changes({"dispatch_policy", "dispatch_queue_size"})
+    checks.append(("queue settings reloaded", app.dispatcher is dispatcher
+                   and (dispatcher.policy, dispatcher.maxsize) == ("drop_oldest", 8)))
+    
+    # A number skipped because the queue is full is not remembered as a duplicate
+    app = ClipboardWhatsAppSender(config_overrides={"numbers_only_mode": False, "avoid_duplicates": True})
+    app.refresh_settings()
+    app.processed_numbers = DuplicateStore()
+    app.dispatcher = DispatchQueue(app.dispatch_open, maxsize=1, policy="drop_newest")
+    app.check_clipboard("+971501234567")
+    app.check_clipboard("+12345678900")
+    checks.append(("skipped number not a duplicate", "+971501234567" in app.processed_numbers
+                   and "+12345678900" not in app.processed_numbers))
+    
+    # Nor is one pushed out of the queue by a newer number
+    app.dispatcher = DispatchQueue(app.dispatch_open, maxsize=1, policy="drop_oldest",
+                                   on_evict=app.forget_evicted)
+    app.check_clipboard("+442079460958")
+    app.check_clipboard("+971501234568")
+    checks.append(("evicted number not a duplicate", "+442079460958" not in app.processed_numbers
+                   and "+971501234568" in app.processed_numbers and app.metrics.dropped.value == 2))
+    
+    report_checks(checks)
+
+def test_rate_limiter():
+    """Test the token bucket in front of chat opens"""
+    print("🚦 Testing Rate Limiter")
+    print("=" * 25)
+    
+    now = [0.0]
+    clock = lambda: now[0]
+    
+    checks = []
+    limiter = TokenBucket(rate=1.0, burst=2, overflow="queue", clock=clock)
+    waits = [limiter.reserve() for _ in range(4)]
+    checks.append(("burst then deferred in order", waits == [0.0, 0.0, 1.0, 2.0]))
+    now[0] = 10.0
+    checks.append(("refills after idle", limiter.reserve() == 0.0))
+    
+    limiter = TokenBucket(rate=1.0, burst=1, overflow="drop", clock=clock)
+    waits = [limiter.reserve() for _ in range(3)]
+    checks.append(("drops on overflow", waits == [0.0, None, None]))
+    checks.append(("counters", limiter.stats() == {"allowed": 1, "deferred": 0, "dropped": 2}))
+    
+    checks.append(("unknown overflow falls back",
+                   TokenBucket.from_config({"open_overflow": "skip"}).overflow == "queue"))
+    
+    # A chat dropped by the limiter is not remembered as a duplicate
+    app = ClipboardWhatsAppSender(config_overrides={"opener_backend": "fake", "auto_open_browser": True,
+                                                    "use_whatsapp_app": False, "open_burst": 1,
+                                                    "open_overflow": "drop"})
+    app.refresh_settings()
+    app.processed_numbers = DuplicateStore()
+    for number in ("+971501234567", "+12345678900"):
+        app.processed_numbers.add(number)
+        app.dispatch_open(DispatchRequest(number, "Hi", time.monotonic()))
+    checks.append(("dropped chat not a duplicate", "+971501234567" in app.processed_numbers
+                   and "+12345678900" not in app.processed_numbers))
+    
+    report_checks(checks)
+
+def test_config_manager():
+    """Test debounced atomic saves and hot reload of the config file"""
+    print("🗂️ Testing Config Manager")
+    print("=" * 25)
+    
+    checks = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "config.json")
+        manager = ConfigManager(path, {"numbers_only_mode": False}, save_delay=0.2)
+        config = manager.load()
+        
+        # Several quick changes are written once, after the delay
+        writes = []
+        original_save = manager.save
+        manager.save = lambda: writes.append(1) or original_save()
+        for value in (True, False, True):
+            config["numbers_only_mode"] = value
+            manager.schedule_save()
+        checks.append(("save is deferred", not os.path.exists(path)))
+        time.sleep(0.5)
+        checks.append(("rapid changes coalesced", len(writes) == 1))
+        checks.append(("no temp files left", os.listdir(directory) == ["config.json"]))
+        checks.append(("own write not reloaded", manager.check_for_changes() == set()))
+        
+        # Saving keeps the file's permissions
+        os.chmod(path, 0o664)
+        manager.save()
+        checks.append(("file mode kept", os.stat(path).st_mode & 0o777 == 0o664))
+        
+        # An external edit is picked up by the running app
+        changes = []
+        manager.add_listener(changes.append)
+        with open(path, 'w') as f:
+            f.write('{"numbers_only_mode": false, "default_message": "Hi"}')
+        os.utime(path, ns=(0, 10 ** 18))
+        manager.check_for_changes()
+        checks.append(("external edit reloaded", config["numbers_only_mode"] is False
+                       and config["default_message"] == "Hi"))
+        checks.append(("listeners told what changed",
+                       changes == [{"numbers_only_mode", "default_message"}]))
+        
+        # A half-written file is ignored
+        with open(path, 'w') as f:
+            f.write('{"numbers_only_mode": tr')
+        os.utime(path, ns=(0, 2 * 10 ** 18))
+        manager.check_for_changes()
+        checks.append(("invalid file ignored", config["default_message"] == "Hi"))
+        
+        # Command line overrides are neither saved nor lost on reload
+        overridden = ConfigManager(path, {"log_format": "text"}, overrides={"log_format": "json"})
+        config = overridden.load()
+        overridden.save()
+        with open(path) as f:
+            saved = json.load(f)
+        checks.append(("overrides not saved", config["log_format"] == "json" and saved["log_format"] == "text"))
+        with open(path, 'w') as f:
+            f.write('{"log_format": "text", "default_message": "Hey"}')
+        os.utime(path, ns=(0, 3 * 10 ** 18))
+        overridden.check_for_changes()
+        checks.append(("overrides survive reload", config["log_format"] == "json"
+                       and config["default_message"] == "Hey"))
+    
+    report_checks(checks)
+
+def test_settings_snapshot():
+    """Test that the monitor reads settings from an immutable snapshot"""
+    print("📸 Testing Settings Snapshot")
+    print("=" * 28)
+    
+    checks = []
+    settings = MonitorSettings.from_config({"default_message": "Hello"}, "  Custom  ")
+    checks.append(("message box overrides default", settings.message == "Custom"))
+    checks.append(("blank message box ignored",
+                   MonitorSettings.from_config({"default_message": "Hello"}, " ").message == "Hello"))
+    try:
+        settings.numbers_only_mode = True
+        checks.append(("snapshot is read-only", False))
+    except AttributeError:
+        checks.append(("snapshot is read-only", True))
+    
+    app = ClipboardWhatsAppSender()
+    app.config["numbers_only_mode"] = False
+    app.config["avoid_duplicates"] = True
+    app.refresh_settings()
+    app.processed_numbers = DuplicateStore()
+    submitted = []
+    app.dispatcher.submit = lambda number, message, detected_at=None: submitted.append(message) or True
+    
+    # Config edits only reach the monitor once the snapshot is rebuilt
+    app.config["numbers_only_mode"] = True
+    app.check_clipboard("Call +971501234567 today")
+    checks.append(("old snapshot still used", len(submitted) == 1))
+    app.message_override = "From the message box"
+    app.refresh_settings()
+    app.check_clipboard("Call +971501234568 today")
+    checks.append(("new snapshot applied", len(submitted) == 1))
+    app.check_clipboard("+971501234569")
+    checks.append(("message from snapshot", submitted[-1:] == ["From the message box"]))
+    
+    report_checks(checks)
+
+def test_message_templates():
+    """Test placeholder filling and pre-encoded message templates"""
+    print("📝 Testing Message Templates")
+    print("=" * 28)
+    
+    test_cases = [
+        # Template, Expected text
+        ("Hello {name}, we got {number} on {date}", "Hello Sara, we got +971501234567 on 2024-05-01"),
+        ("السلام عليكم {name}", "السلام عليكم Sara"),
+        ("No placeholders {{here}}", "No placeholders {{here}}"),
+        ("Unknown {field} kept", "Unknown {field} kept"),
+        ("Unbalanced { brace", "Unbalanced { brace"),
+    ]
+    
+    passed = 0
+    failed = 0
+    for text, expected in test_cases:
+        template = compile_template(text)
+        values = {"number": "+971501234567", "name": "Sara", "date": "2024-05-01"}
+        rendered = template.render(**values)
+        encoded = template.render_encoded(**values)
+        if rendered == expected and encoded == quote(expected):
+            passed += 1
+            print(f"  ✅ PASS '{text}' -> '{rendered}'")
+        else:
+            failed += 1
+            print(f"  ❌ FAIL '{text}' -> '{rendered}' (expected '{expected}')")
+    
+    if compile_template("Hi {name}") is compile_template("Hi {name}"):
+        passed += 1
+        print("  ✅ PASS templates compiled once")
+    else:
+        failed += 1
+        print("  ❌ FAIL templates compiled once")
+    
+    print(f"📊 Results: {passed} passed, {failed} failed")
+    assert failed == 0, f"{failed} failed"
+
+def test_campaign_runner():
+    """Test a bulk campaign that is stopped and then resumed from its checkpoint"""
+    print("📣 Testing Campaign Runner")
+    print("=" * 26)
+    
+    app = ClipboardWhatsAppSender()
+    app.processed_numbers = DuplicateStore()
+    opened = []
+    
+    checks = []
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, "contacts.csv")
+        with open(source, 'w', encoding='utf-8') as f:
+            f.write("name,phone\nSara,+971 50 123 4567\nOmar,(234) 567-8900\n"
+                    "Sara again,+971501234567\nNo number,n/a\nLina,+44 20 7946 0958\n")
+        
+        runner = CampaignRunner(app, source, message="Hi {name}", rate_per_minute=6000)
+        
+        def open_and_stop(number, message=None, name="", rate_limited=True):
+            opened.append((number, name))
+            if len(opened) == 2:
+                runner.stop()
+            return True
+        app.open_whatsapp = open_and_stop
+        
+        checks.append(("stops when asked", runner.run() is False and len(opened) == 2))
+        
+        resumed = CampaignRunner(app, source, message="Hi {name}", rate_per_minute=6000)
+        checks.append(("resumes and finishes", resumed.run() is True))
+        checks.append(("each number opened once", opened == [
+            ("+971501234567", "Sara"), ("+12345678900", "Omar"), ("+442079460958", "Lina")
+        ]))
+        checks.append(("duplicates counted", resumed.stats["duplicates"] == 1))
+        checks.append(("finished run recorded", resumed.is_finished()))
+    
+    report_checks(checks)
+
+def test_link_export():
+    """Test streaming wa.me link export to CSV, JSONL and HTML"""
+    print("📤 Testing Link Export")
+    print("=" * 22)
+    
+    checks = []
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, "numbers.txt")
+        with open(source, 'w', encoding='utf-8') as f:
+            f.write("+971 50 123 4567\nCall (234) 567-8900 or +44 20 7946 0958\nnothing here\n")
+        
+        csv_path = os.path.join(directory, "links.csv")
+        count = export_links(source, csv_path, message="Hi {number}")
+        with open(csv_path, encoding='utf-8') as f:
+            rows = f.read().splitlines()
+        checks.append(("csv rows", count == 3 and rows[0] == "number,name,url" and
+                       rows[1] == "+971501234567,,https://wa.me/971501234567?text=Hi%20%2B971501234567"))
+        
+        jsonl_path = os.path.join(directory, "links.jsonl")
+        export_links(source, jsonl_path)
+        with open(jsonl_path, encoding='utf-8') as f:
+            links = [json.loads(line) for line in f]
+        checks.append(("jsonl rows", [link["url"] for link in links] == [
+            "https://wa.me/971501234567", "https://wa.me/12345678900", "https://wa.me/442079460958"
+        ]))
+        
+        html_path = os.path.join(directory, "links.html")
+        export_links(source, html_path)
+        with open(html_path, encoding='utf-8') as f:
+            page = f.read()
+        checks.append(("html page", page.count('<a href="https://wa.me/') == 3
+                       and page.rstrip().endswith("</html>")))
+    
+    report_checks(checks)
+
+def test_metrics():
+    """Test runtime counters, histograms and the metrics endpoint"""
+    print("📈 Testing Metrics")
+    print("=" * 18)
+    
+    checks = []
+    registry = MetricsRegistry()
+    counter = registry.counter("test_total", "Test counter")
+    histogram = registry.histogram("test_seconds", "Test histogram", buckets=(0.1, 1.0))
+    counter.inc()
+    counter.inc(2)
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value)
+    text = registry.render_prometheus()
+    checks.append(("counter exposition", "# TYPE test_total counter\ntest_total 3\n" in text))
+    checks.append(("cumulative buckets", 'test_seconds_bucket{le="0.1"} 1\n' in text
+                   and 'test_seconds_bucket{le="1"} 2\n' in text
+                   and 'test_seconds_bucket{le="+Inf"} 3\n' in text and "test_seconds_count 3\n" in text))
+    histogram.observe(1234567.0)
+    checks.append(("full precision sums", "test_seconds_sum 1234572.55\n" in registry.render_prometheus()))
+    
+    # The monitor records detection and copy-to-open latency
+    app = ClipboardWhatsAppSender(config_overrides={"numbers_only_mode": False, "avoid_duplicates": False})
+    app.refresh_settings()
+    app.processed_numbers = DuplicateStore()
+    requests = []
+    app.dispatcher.submit = lambda number, message, detected_at=None: requests.append(
+        (number, message, detected_at)) or True
+    app.open_whatsapp = lambda number, message=None: True
+    app.check_clipboard("Call +971 50 123 4567")
+    app.check_clipboard("no number here")
+    for number, message, detected_at in requests:
+        app.dispatch_open(DispatchRequest(number, message, detected_at))
+    metrics = app.metrics
+    checks.append(("detections counted", metrics.detections.value == 1 and metrics.detect_seconds.count == 2))
+    checks.append(("copy-to-open observed", metrics.copy_to_open_seconds.count == 1))
+    
+    server = MetricsServer(registry, 0)
+    server.start()
+    try:
+        with urlopen(f"http://127.0.0.1:{server.port}/metrics", timeout=5) as response:
+            served = response.read().decode("utf-8")
+        with urlopen(f"http://127.0.0.1:{server.port}/metrics.json", timeout=5) as response:
+            served_json = json.loads(response.read().decode("utf-8"))
+    finally:
+        server.stop()
+    checks.append(("endpoint serves text and json", served == registry.render_prometheus()
+                   and served_json["test_total"] == 3 and served_json["test_seconds"]["count"] == 4))
+    
+    report_checks(checks)
+
+def test_openers():
+    """Test opener backends without a real browser"""
+    print("🚪 Testing Openers")
+    print("=" * 18)
+    
+    checks = []
+    app = ClipboardWhatsAppSender(config_overrides={"opener_backend": "fake", "use_whatsapp_app": True,
+                                                    "auto_open_browser": True})
+    app.refresh_settings()
+    opener = app.app_opener
+    checks.append(("fake backend shared", isinstance(opener, RecordingOpener) and app.web_opener is opener))
+    
+    app.open_whatsapp("+971501234567", "Hi", rate_limited=False)
+    opener.result = False
+    app.open_whatsapp("+12345678900", "Hi", rate_limited=False)
+    checks.append(("app link, then web fallback", opener.urls == [
+        "whatsapp://send?phone=971501234567&text=Hi",
+        "whatsapp://send?phone=12345678900&text=Hi",
+        "https://wa.me/12345678900?text=Hi",
+    ]))
+    
+    app_opener, web_opener = create_openers("auto")
+    checks.append(("auto uses system and browser", (app_opener.name, web_opener.name) == ("system", "web")))
+    app_opener, web_opener = create_openers("chrome")
+    checks.append(("unknown backend falls back to auto", (app_opener.name, web_opener.name) == ("system", "web")))
+    
+    # A stand-in helper that accepts links starting with "ok:"
+    script = "import sys\nfor line in sys.stdin:\n    print('ok' if line.startswith('ok:') else 'error', flush=True)"
+    helper = HelperProcessOpener([sys.executable, "-c", script])
+    try:
+        results = [helper.open("ok:1"), helper.open("bad:2"), helper.open("ok:3")]
+        checks.append(("helper reused for every link", results == [True, False, True] and helper.started == 1))
+        helper._process.kill()
+        helper._process.wait()
+        checks.append(("helper restarted after exit", helper.open("ok:4") and helper.started == 2))
+    finally:
+        helper.close()
+    
+    # A helper that stops answering is killed and replaced
+    script = ("import sys, time\nfor line in sys.stdin:\n"
+              "    time.sleep(60 if line.startswith('hang:') else 0)\n    print('ok', flush=True)")
+    helper = HelperProcessOpener([sys.executable, "-c", script], reply_timeout=0.5)
+    try:
+        started = time.time()
+        checks.append(("hung helper times out", helper.open("hang:1") is False and time.time() - started < 5))
+        checks.append(("hung helper replaced", helper.open("ok:2") and helper.started == 2))
+    finally:
+        helper.close()
+    
+    # Output from programs the helper starts is not read as a reply
+    script = ("import os, sys\nsys.path.insert(0, {!r})\nimport openers\n"
+              "openers.open_url = lambda url: os.system('echo Opening in existing browser session.') == 0\n"
+              "sys.exit(openers.serve_helper())").format(REPO_DIR)
+    helper = HelperProcessOpener([sys.executable, "-c", script])
+    try:
+        checks.append(("child output kept off the reply pipe",
+                       [helper.open("https://wa.me/1"), helper.open("https://wa.me/2")] == [True, True]))
+    finally:
+        helper.close()
+    
+    report_checks(checks)
+
+def test_multi_number_mode():
+    """Test queueing a chat for every number in a copied list"""
+    print("📚 Testing Multi-Number Mode")
+    print("=" * 28)
+    
+    checks = []
+    detector = PhoneNumberDetector()
+    numbers, is_only = detector.detect_all("+971 50 123 4567\n(234) 567-8900,\n+971501234567\n")
+    checks.append(("distinct numbers in order", numbers == ["+971501234567", "+12345678900"] and is_only))
+    checks.append(("extra text noticed", detector.detect_all("Ali: +971 50 123 4567")[1] is False))
+    column = "+971 50 123 4567\n(234) 567-8900\n+44 20 79"
+    checks.append(("number cut off at the end skipped", detector.detect_all(column, truncated=True)[0]
+                   == ["+971501234567", "+12345678900"]))
+    
+    app = ClipboardWhatsAppSender(config_overrides={"multi_number_mode": True, "avoid_duplicates": True,
+                                                    "numbers_only_mode": False, "multi_number_max": 150})
+    app.refresh_settings()
+    app.processed_numbers = DuplicateStore()
+    app.processed_numbers.add("+12025550100")
+    app.dispatcher = DispatchQueue(app.dispatch_open, maxsize=4, batch_size=150)
+    column = "\n".join(f"+1202555{index:04d}" for index in range(100, 300))
+    app.check_clipboard(column + "\n+12025550150")
+    checks.append(("whole list queued past the queue size", app.dispatcher.pending() == 150))
+    checks.append(("duplicates counted", app.metrics.duplicates.value == 1 and app.metrics.detections.value == 150))
+    
+    opened = []
+    app.open_whatsapp = lambda number, message=None, paced=False: opened.append((number, paced)) or True
+    app.dispatch_open(app.dispatcher._popleft())
+    checks.append(("paced open recorded", opened == [("+12025550101", True)]
+                   and "+12025550101" in app.processed_numbers))
+    
+    # Further lists only fill the queue up to maxsize + batch_size
+    app.check_clipboard("\n".join(f"+1303555{index:04d}" for index in range(100, 150)))
+    checks.append(("queue stays bounded", app.dispatcher.pending() == 154
+                   and app.metrics.dropped.value == 45))
+    
+    # Stopping cancels the queued list, including an open waiting for its turn
+    app.stop_monitoring()
+    del app.open_whatsapp
+    app.rate_limiter = TokenBucket(rate=0.01, burst=1)
+    app.rate_limiter.reserve()
+    started = time.time()
+    checks.append(("stop cancels queued list", app.dispatcher.pending() == 0
+                   and app.wait_for_rate_limit("+12025550102", paced=True) is False
+                   and time.time() - started < 1))
+    
+    limiter = TokenBucket(rate=1.0, burst=1, overflow="drop")
+    limiter.reserve()
+    checks.append(("paced opens wait instead of dropping", limiter.reserve() is None
+                   and limiter.reserve(always_wait=True) > 0))
+    
+    report_checks(checks)
+
+def test_gui_log():
+    """Test batched activity log writes and the line limit"""
+    print("🪵 Testing GUI Log")
+    print("=" * 18)
+    
+    class Text:
+        """Stands in for the Tk text widget (which keeps an empty last line)"""
+        def __init__(self):
+            self.content = ""
+            self.inserts = 0
+        def insert(self, index, text):
+            self.content += text
+            self.inserts += 1
+        def index(self, index):
+            lines = self.content.split("\n")
+            return f"{len(lines)}.{len(lines[-1])}"
+        def delete(self, start, end):
+            self.content = "\n".join(self.content.split("\n")[int(end.split(".")[0]) - 1:])
+        def see(self, index):
+            pass
+    
+    checks = []
+    app = ClipboardWhatsAppSender(config_overrides={"gui_log_max_lines": 3})
+    app.log_text = Text()
+    for index in range(5):
+        app.log_to_gui(f"message {index}")
+    checks.append(("nothing written off the Tk thread", app.log_text.inserts == 0))
+    app.drain_gui_log()
+    lines = app.log_text.content.splitlines()
+    checks.append(("one write per batch", app.log_text.inserts == 1))
+    checks.append(("newest lines kept", [line.split("] ")[1] for line in lines]
+                   == ["message 2", "message 3", "message 4"]))
+    
+    for index in range(GUI_LOG_BATCH_SIZE + 10):
+        app.log_to_gui(f"message {index}")
+    app.drain_gui_log()
+    checks.append(("batch size limited", app.gui_log_queue.qsize() == 10))
+    
+    report_checks(checks)
+
+def test_file_logging():
+    """Test the rotating log file settings"""
+    print("🗄️ Testing File Logging")
+    print("=" * 23)
+    
+    checks = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "app.log")
+        handler = create_file_handler(path, {"log_rotate_when": "midnight"})
+        handler.close()
+        checks.append(("rotates on a schedule", isinstance(handler, logging.handlers.TimedRotatingFileHandler)))
+        handler = create_file_handler(path, {"log_rotate_when": "weekly"})
+        handler.close()
+        checks.append(("invalid schedule falls back to size", type(handler) is logging.handlers.RotatingFileHandler))
+        
+        # Rotated files are compressed, and only log_backup_count are kept
+        path = os.path.join(directory, "size.log")
+        handler = create_file_handler(path, {"log_max_bytes": 200, "log_backup_count": 2})
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        for index in range(20):
+            handler.emit(logging.makeLogRecord({"msg": f"line {index:02d} " + "x" * 40}))
+        handler.close()
+        rotated = sorted(name for name in os.listdir(directory) if name.startswith("size.log"))
+        checks.append(("rotates by size", rotated == ["size.log", "size.log.1.gz", "size.log.2.gz"]))
+        with gzip.open(path + ".1.gz", "rt") as f:
+            newest_backup = f.read().splitlines()
+        checks.append(("backups gzip-compressed", newest_backup[-1].startswith("line 15 ")))
+        
+        path = os.path.join(directory, "plain.log")
+        handler = create_file_handler(path, {"log_max_bytes": 100, "log_compress": False})
+        for index in range(5):
+            handler.emit(logging.makeLogRecord({"msg": "x" * 40}))
+        handler.close()
+        checks.append(("compression can be turned off", os.path.exists(path + ".1")))
+    
+    report_checks(checks)
+
+def test_headless_mode():
+    """Test running without a window"""
+    print("🖥️ Testing Headless Mode")
+    print("=" * 24)
+    
+    checks = []
+    app = ClipboardWhatsAppSender(headless=True, config_overrides={"opener_backend": "fake",
+                                                                   "use_whatsapp_app": True})
+    app.refresh_settings()
+    messages = []
+    handler = logging.Handler()
+    handler.emit = lambda record: messages.append(record.getMessage())
+    app.logger.addHandler(handler)
+    try:
+        app.open_whatsapp("+971501234567", "Hi", rate_limited=False)
+    finally:
+        app.logger.removeHandler(handler)
+    checks.append(("each event logged once", messages == ["Opened WhatsApp app for +971501234567"]))
+    
+    # A fresh process in headless mode never loads the GUI or browser modules
+    script = ("import sys\nsys.path.insert(0, {!r})\nimport main\n"
+              "app = main.ClipboardWhatsAppSender(headless=True)\napp.refresh_settings()\n"
+              "print(sorted(set(sys.modules) & {{'tkinter', 'pyperclip', 'webbrowser'}}))").format(REPO_DIR)
+    result = subprocess.run([sys.executable, "-c", script], stdout=subprocess.PIPE,
+                            stderr=subprocess.DEVNULL, universal_newlines=True)
+    checks.append(("no tkinter, pyperclip or webbrowser", result.stdout.strip() == "[]"))
+    
+    report_checks(checks)
 
 def test_url_generation():
     """Test WhatsApp URL generation"""
@@ -128,8 +1093,80 @@ def main():
     print("=" * 50)
     print()
     
+    # The apps built by the tests keep their config.json, log file and
+    # duplicate DB in a temporary directory instead of the repo
+    work_dir = tempfile.mkdtemp(prefix="clipboard_whatsapp_test_")
+    atexit.register(shutil.rmtree, work_dir, ignore_errors=True)
+    os.chdir(work_dir)
+    
     # Run tests
-    phone_test_passed = test_phone_detection()
+    phone_test_passed = run_test(test_phone_detection)
+    print()
+    
+    phone_test_passed = run_test(test_single_pass_detection) and phone_test_passed
+    print()
+    
+    phone_test_passed = run_test(test_detection_cache) and phone_test_passed
+    print()
+    
+    phone_test_passed = run_test(test_streaming_extraction) and phone_test_passed
+    print()
+    
+    phone_test_passed = run_test(test_normalizer) and phone_test_passed
+    print()
+    
+    phone_test_passed = run_test(test_clipboard_watcher) and phone_test_passed
+    print()
+    
+    phone_test_passed = run_test(test_change_detection) and phone_test_passed
+    print()
+    
+    phone_test_passed = run_test(test_clipboard_reader) and phone_test_passed
+    print()
+    
+    phone_test_passed = run_test(test_adaptive_polling) and phone_test_passed
+    print()
+    
+    phone_test_passed = run_test(test_duplicate_store) and phone_test_passed
+    print()
+    
+    phone_test_passed = run_test(test_dispatch_queue) and phone_test_passed
+    print()
+    
+    phone_test_passed = run_test(test_rate_limiter) and phone_test_passed
+    print()
+    
+    phone_test_passed = run_test(test_config_manager) and phone_test_passed
+    print()
+    
+    phone_test_passed = run_test(test_settings_snapshot) and phone_test_passed
+    print()
+    
+    phone_test_passed = run_test(test_message_templates) and phone_test_passed
+    print()
+    
+    phone_test_passed = run_test(test_campaign_runner) and phone_test_passed
+    print()
+    
+    phone_test_passed = run_test(test_link_export) and phone_test_passed
+    print()
+    
+    phone_test_passed = run_test(test_metrics) and phone_test_passed
+    print()
+    
+    phone_test_passed = run_test(test_openers) and phone_test_passed
+    print()
+    
+    phone_test_passed = run_test(test_multi_number_mode) and phone_test_passed
+    print()
+    
+    phone_test_passed = run_test(test_gui_log) and phone_test_passed
+    print()
+    
+    phone_test_passed = run_test(test_file_logging) and phone_test_passed
+    print()
+    
+    phone_test_passed = run_test(test_headless_mode) and phone_test_passed
     print()
     
     test_url_generation()
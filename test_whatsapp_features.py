@@ -63,7 +63,7 @@ def test_whatsapp_features():
     print()
     print("✨ Duplicate Prevention Improvements:")
     print("   • Added immediate duplicate tracking")
-    print("   • Added 0.5s delay after processing")
+    print("   • Chats open on a background queue, once per number")
     print("   • Better clipboard change detection")
     
     print()